@@ -10,6 +10,18 @@ app = Celery('BTCBOT')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
+# Signals never queue here: `manage.py consume_signals` executes them in its own process, so they can't wait
+# behind monitoring work. Monitoring is mostly waiting on the exchange and Redis; its queue runs on a gevent
+# worker (see docker-compose.yml) where hundreds of those waits cost one process.
+MONITORING_QUEUE = 'monitoring'
+
+app.conf.task_default_queue = 'celery'
+app.conf.task_routes = {
+    'Logic.tasks.monitor_sltp_orders_tick': {'queue': MONITORING_QUEUE},
+    'Logic.tasks.trailing_stop_tick': {'queue': MONITORING_QUEUE},
+    'Logic.tasks.refresh_mark_price': {'queue': MONITORING_QUEUE},
+}
+
 app.autodiscover_tasks()
 
 
@@ -34,6 +34,37 @@ CELERY_BROKER_URL = 'redis://redis:6379/0'
 CELERY_RESULT_BACKEND = 'redis://redis:6379/0'
 
 
+# CoinCatch REST client (one keep-alive connection pool per process, see Logic/client.py)
+
+COINCATCH_BASE_URL = os.environ.get('COINCATCH_BASE_URL', 'https://api.coincatch.com')
+COINCATCH_CONNECT_TIMEOUT = float(os.environ.get('COINCATCH_CONNECT_TIMEOUT', '3.05'))
+COINCATCH_READ_TIMEOUT = float(os.environ.get('COINCATCH_READ_TIMEOUT', '10'))
+COINCATCH_POOL_CONNECTIONS = int(os.environ.get('COINCATCH_POOL_CONNECTIONS', '4'))
+COINCATCH_POOL_MAXSIZE = int(os.environ.get('COINCATCH_POOL_MAXSIZE', '32'))
+
+# Redis token buckets shared by all workers, per API key and endpoint class: (requests per second, burst)
+EXCHANGE_RATE_LIMIT_ENABLED = os.environ.get('EXCHANGE_RATE_LIMIT_ENABLED', 'True') == 'True'
+EXCHANGE_RATE_LIMIT_MAX_WAIT = float(os.environ.get('EXCHANGE_RATE_LIMIT_MAX_WAIT', '2'))
+EXCHANGE_RATE_LIMITS = {
+    'order': (10, 10),
+    'plan': (10, 10),
+    'market': (20, 20),
+}
+
+# Private order/plan stream consumed by `manage.py run_order_stream` (Logic/order_stream.py)
+COINCATCH_WS_URL = os.environ.get('COINCATCH_WS_URL', 'wss://ws.coincatch.com/public/v1/stream')
+COINCATCH_WS_PING_INTERVAL = float(os.environ.get('COINCATCH_WS_PING_INTERVAL', '25'))
+COINCATCH_WS_RECONNECT_DELAY = float(os.environ.get('COINCATCH_WS_RECONNECT_DELAY', '1'))
+COINCATCH_WS_TRADER_REFRESH = float(os.environ.get('COINCATCH_WS_TRADER_REFRESH', '60'))
+
+# Threads used to run one signal for all traders at once (Logic/engine.py); keep it <= COINCATCH_POOL_MAXSIZE
+SIGNAL_FANOUT_WORKERS = int(os.environ.get('SIGNAL_FANOUT_WORKERS', '32'))
+
+# Flip an opposite position with one reverse order instead of close + open (Position.reverse_position)
+REVERSE_POSITION_MODE = os.environ.get('REVERSE_POSITION_MODE', 'False') == 'True'
+REVERSE_FILLS_ATTEMPTS = int(os.environ.get('REVERSE_FILLS_ATTEMPTS', '5'))
+REVERSE_FILLS_RETRY_DELAY = float(os.environ.get('REVERSE_FILLS_RETRY_DELAY', '0.2'))
+
 
 # Application definition
 
@@ -139,12 +170,80 @@ STATIC_URL = 'static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
-# CELERY_BEAT_SCHEDULE = {
-#     'run-every-second': {
-#         'task': 'Logic.tasks.inquiry_task',
-#         'schedule': 1000.0,
-#     },
-# }
+# Shared mark-price feed: one beat producer per symbol writes the latest price to the cache (Logic/price_feed.py)
+PRICE_FEED_COINS = os.environ.get('PRICE_FEED_COINS', 'BTCUSDT_UMCBL').split(',')
+PRICE_FEED_INTERVAL = float(os.environ.get('PRICE_FEED_INTERVAL', '1'))
+PRICE_FEED_MAX_STALENESS = float(os.environ.get('PRICE_FEED_MAX_STALENESS', '3'))
+PRICE_FEED_TTL = int(os.environ.get('PRICE_FEED_TTL', '60'))
+PRICE_HISTORY_SECONDS = int(os.environ.get('PRICE_HISTORY_SECONDS', '300'))
+
+# One tick checks the SL/TP orders of every active position (Logic/monitor.py)
+SLTP_MONITOR_INTERVAL = float(os.environ.get('SLTP_MONITOR_INTERVAL', '5'))
+SLTP_MONITOR_LOCK_TIMEOUT = int(os.environ.get('SLTP_MONITOR_LOCK_TIMEOUT', '60'))
+# historyPlan is read page by page (lastEndId) until the missing orders are found or the pages run out
+HISTORY_PLAN_PAGE_SIZE = int(os.environ.get('HISTORY_PLAN_PAGE_SIZE', '100'))
+HISTORY_PLAN_MAX_PAGES = int(os.environ.get('HISTORY_PLAN_MAX_PAGES', '20'))
+# The historyPlan window starts this many seconds before the oldest missing order was recorded: the exchange
+# stamps a plan before we write its row, and the two clocks differ
+HISTORY_PLAN_LOOKBACK = float(os.environ.get('HISTORY_PLAN_LOOKBACK', '300'))
+# A tick only probes positions whose trigger the price reached since the last tick, or came within
+# SLTP_TRIGGER_BAND (a fraction of the price) of (Logic/trigger_book.py); every
+# SLTP_MONITOR_FULL_SWEEP_INTERVAL seconds, or when the price feed has gaps, it probes all of them
+SLTP_TRIGGER_BAND = float(os.environ.get('SLTP_TRIGGER_BAND', '0.001'))
+SLTP_MONITOR_FULL_SWEEP_INTERVAL = float(os.environ.get('SLTP_MONITOR_FULL_SWEEP_INTERVAL', '60'))
+
+# Active position counters in Redis (Logic/active_positions.py) are recounted from the database this often (seconds)
+ACTIVE_POSITIONS_RECOUNT_INTERVAL = int(os.environ.get('ACTIVE_POSITIONS_RECOUNT_INTERVAL', '300'))
+
+# Trailing stops (Logic/trailing.py): every new bracket gets a rule keeping its SL TRAILING_STOP_DISTANCE behind
+# the best price once the price moved TRAILING_STOP_ACTIVATION past the entry; 0 turns trailing off. The SL is
+# only moved when that gains at least TRAILING_STOP_STEP, with up to TRAILING_STOP_WORKERS modifications at once
+TRAILING_STOP_DISTANCE = float(os.environ.get('TRAILING_STOP_DISTANCE', '0'))
+TRAILING_STOP_ACTIVATION = float(os.environ.get('TRAILING_STOP_ACTIVATION', '50'))
+TRAILING_STOP_STEP = float(os.environ.get('TRAILING_STOP_STEP', '10'))
+TRAILING_STOP_WORKERS = int(os.environ.get('TRAILING_STOP_WORKERS', '8'))
+TRAILING_STOP_LOCK_TIMEOUT = int(os.environ.get('TRAILING_STOP_LOCK_TIMEOUT', '30'))
+
+# Per-trader Redis lease around get_long_sign/get_short_sign (Logic/trader_lock.py). The holder renews it while it
+# works (reverse fill retries, rate limiter waits), for up to TRADER_LOCK_MAX_HOLD seconds, so TRADER_LOCK_LEASE
+# only bounds how long a worker that died keeps its trader blocked
+TRADER_LOCK_LEASE = float(os.environ.get('TRADER_LOCK_LEASE', '40'))
+TRADER_LOCK_MAX_HOLD = float(os.environ.get('TRADER_LOCK_MAX_HOLD', '300'))
+TRADER_LOCK_WAIT = float(os.environ.get('TRADER_LOCK_WAIT', '10'))
+TRADER_LOCK_POLL = float(os.environ.get('TRADER_LOCK_POLL', '0.05'))
+# Webhook signals go through a Redis stream to `manage.py consume_signals` (Logic/signal_stream.py); signals
+# arriving within SIGNAL_COALESCE_MS of each other collapse into the last one, 0 runs every signal
+SIGNAL_COALESCE_MS = int(os.environ.get('SIGNAL_COALESCE_MS', '250'))
+SIGNAL_STREAM_MAXLEN = int(os.environ.get('SIGNAL_STREAM_MAXLEN', '10000'))
+# Signals still pending when a consumer restarts are dropped as expired once they are older than this (seconds)
+SIGNAL_MAX_AGE = float(os.environ.get('SIGNAL_MAX_AGE', '30'))
+
+# JSON logs of the Logic app, written by a background listener thread (Logic/log.py); stdout when LOG_FILE is unset
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FILE = os.environ.get('LOG_FILE') or None
+# Keep one in this many of the per-position monitor lines
+LOG_MONITOR_SAMPLE = int(os.environ.get('LOG_MONITOR_SAMPLE', '20'))
+
+CELERY_BEAT_SCHEDULE = {
+    'monitor-sltp-orders': {
+        'task': 'Logic.tasks.monitor_sltp_orders_tick',
+        'schedule': SLTP_MONITOR_INTERVAL,
+        'options': {'expires': SLTP_MONITOR_INTERVAL},
+    },
+    'trailing-stops': {
+        'task': 'Logic.tasks.trailing_stop_tick',
+        'schedule': PRICE_FEED_INTERVAL,
+        'options': {'expires': PRICE_FEED_INTERVAL},
+    },
+}
+CELERY_BEAT_SCHEDULE.update({
+    f'refresh-mark-price-{coin}': {
+        'task': 'Logic.tasks.refresh_mark_price',
+        'schedule': PRICE_FEED_INTERVAL,
+        'args': [coin],
+        'options': {'expires': PRICE_FEED_INTERVAL},
+    } for coin in PRICE_FEED_COINS
+})
 
 
 CACHES = {
@@ -0,0 +1,105 @@
+import logging
+
+from django.conf import settings
+from django.db.models import Count
+from django_redis import get_redis_connection
+
+ACTIVE_POSITIONS_KEY = "active_positions"
+ACTIVE_POSITIONS_PER_TRADER_KEY = "active_positions_per_trader"
+ACTIVE_POSITIONS_READY_KEY = "active_positions_ready"
+
+logger = logging.getLogger(__name__)
+
+# Membership and per-trader counts change together, and only when membership really
+# changes, so saving the same state twice never double counts.
+MARK_SCRIPT = """
+if ARGV[3] == '1' then
+    if redis.call('SADD', KEYS[1], ARGV[1]) == 1 then
+        redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+    end
+else
+    if redis.call('SREM', KEYS[1], ARGV[1]) == 1 then
+        if redis.call('HINCRBY', KEYS[2], ARGV[2], -1) <= 0 then
+            redis.call('HDEL', KEYS[2], ARGV[2])
+        end
+    end
+end
+return redis.call('SCARD', KEYS[1])
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def mark(position_id: int, trader_id: int, active: bool):
+    _redis().eval(MARK_SCRIPT, 2, ACTIVE_POSITIONS_KEY, ACTIVE_POSITIONS_PER_TRADER_KEY,
+                  position_id, trader_id, 1 if active else 0)
+
+
+def sync_position(position):
+    from Logic.models import State
+    try:
+        mark(position_id=position.id, trader_id=position.trader_id, active=position.state == State.Active.value)
+    except Exception as ve:
+        # Never fail a trade over the counters; they are recounted when the ready key expires.
+        _redis_unavailable(ve)
+
+
+def rebuild():
+    """Recount from the database in one query; readers call it again once ACTIVE_POSITIONS_RECOUNT_INTERVAL passed."""
+    from Logic.models import Position, State
+    rows = list(Position.objects.filter(state=State.Active.value).values_list("id", "trader_id"))
+    per_trader = {}
+    for position_id, trader_id in rows:
+        per_trader[trader_id] = per_trader.get(trader_id, 0) + 1
+    pipeline = _redis().pipeline()
+    pipeline.delete(ACTIVE_POSITIONS_KEY, ACTIVE_POSITIONS_PER_TRADER_KEY)
+    if rows:
+        pipeline.sadd(ACTIVE_POSITIONS_KEY, *[position_id for position_id, trader_id in rows])
+        pipeline.hset(ACTIVE_POSITIONS_PER_TRADER_KEY, mapping=per_trader)
+    # Expiring the ready key bounds how long a missed update (Redis down during a save) can skew the counters.
+    pipeline.set(ACTIVE_POSITIONS_READY_KEY, 1, ex=settings.ACTIVE_POSITIONS_RECOUNT_INTERVAL)
+    pipeline.execute()
+
+
+def _ensure_ready():
+    if not _redis().exists(ACTIVE_POSITIONS_READY_KEY):
+        rebuild()
+
+
+def _redis_unavailable(error):
+    logger.warning("Active position counters unavailable", exc_info=error)
+
+
+def any_active():
+    try:
+        _ensure_ready()
+        return _redis().scard(ACTIVE_POSITIONS_KEY) > 0
+    except Exception as ve:
+        from Logic.models import Position, State
+        _redis_unavailable(ve)
+        return Position.objects.filter(state=State.Active.value).exists()
+
+
+def active_count(trader_id: int):
+    try:
+        _ensure_ready()
+        return int(_redis().hget(ACTIVE_POSITIONS_PER_TRADER_KEY, trader_id) or 0)
+    except Exception as ve:
+        from Logic.models import Position, State
+        _redis_unavailable(ve)
+        return Position.objects.filter(trader_id=trader_id, state=State.Active.value).count()
+
+
+def active_counts():
+    """Active positions per trader id, for traders that have any."""
+    try:
+        _ensure_ready()
+        return {int(trader_id): int(count)
+                for trader_id, count in _redis().hgetall(ACTIVE_POSITIONS_PER_TRADER_KEY).items()}
+    except Exception as ve:
+        from Logic.models import Position, State
+        _redis_unavailable(ve)
+        return dict(Position.objects.filter(state=State.Active.value).values("trader_id")
+                    .annotate(count=Count("id")).values_list("trader_id", "count"))
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from Logic.models import Trader, Position, SLTPOrder, PositionAction
+from Logic.models import Trader, Position, SLTPOrder, PositionAction, TraderDailyPnl, TraderCoinPnl, Signal, \
+    TrailingRule
 
 
 @admin.register(Trader)
@@ -9,7 +10,8 @@ class TraderAdmin(admin.ModelAdmin):
 
 @admin.register(Position)
 class PositionAdmin(admin.ModelAdmin):
-    list_display = ("created", "updated", "trader", "direction", "pnl", "coin", "quantity", "state", "is_ever_updated")
+    list_display = ("created", "updated", "trader", "direction", "pnl", "coin", "quantity", "state", "is_ever_updated",
+                    "entry_price", "average_entry_price")
 
 
 @admin.register(SLTPOrder)
@@ -22,3 +24,22 @@ class PositionActionAdmin(admin.ModelAdmin):
     list_display = ("created", "updated", "trader", "position", "action_side", "price", "quantity", "coin", "remote_id",
                     "profit", "fee")
 
+
+@admin.register(TraderDailyPnl)
+class TraderDailyPnlAdmin(admin.ModelAdmin):
+    list_display = ("trader", "day", "profit", "fee", "volume", "number_of_fills")
+
+
+@admin.register(TraderCoinPnl)
+class TraderCoinPnlAdmin(admin.ModelAdmin):
+    list_display = ("trader", "coin", "profit", "fee", "volume", "number_of_fills")
+
+
+@admin.register(Signal)
+class SignalAdmin(admin.ModelAdmin):
+    list_display = ("created", "direction", "status", "idempotency_key", "trace_id", "processed_at")
+
+
+@admin.register(TrailingRule)
+class TrailingRuleAdmin(admin.ModelAdmin):
+    list_display = ("created", "updated", "position", "distance", "step", "activation_price", "best_price", "state")
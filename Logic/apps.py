@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class LogicConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Logic'
+
+    def ready(self):
+        from . import log
+        log.setup(level=settings.LOG_LEVEL, path=settings.LOG_FILE)
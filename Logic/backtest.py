@@ -0,0 +1,215 @@
+import csv
+import functools
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+# Column layout of the price files: one row per bar, timestamps in ms.
+TIMESTAMP, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+
+
+def default_params():
+    """The live strategy's parameters, as distances from the entry price."""
+    from Logic.models import FIRST_BRACKET_RATIOS, SECOND_BRACKET_RATIOS, FIRST_OPENING_QUANTITY, PositionDirection
+    first_sl, tp1, tp2 = FIRST_BRACKET_RATIOS[PositionDirection.long.value]
+    second_sl = SECOND_BRACKET_RATIOS[PositionDirection.long.value][0]
+    return {
+        "first_sl": float(1 - first_sl),
+        "second_sl": float(1 - second_sl),
+        "tp1": float(tp1 - 1),
+        "tp2": float(tp2 - 1),
+        # Logic.monitor.check_position moves the SL to entry * 0.995 (long) / 1.005 (short) after TP1.
+        "breakeven": 0.005,
+        "max_openings": 2,
+        "quantity": float(FIRST_OPENING_QUANTITY),
+        "fee_rate": 0.0006,
+    }
+
+
+def convert_csv(csv_path: str, npy_path: str):
+    """Turn a ``timestamp,open,high,low,close,volume`` CSV (with header) into a .npy file ``load_ohlcv`` can map."""
+    bars = np.loadtxt(csv_path, delimiter=",", skiprows=1, usecols=range(6), dtype=np.float64, ndmin=2)
+    bars = bars[np.argsort(bars[:, TIMESTAMP], kind="stable")]
+    np.save(npy_path, bars)
+    return len(bars)
+
+
+@functools.lru_cache(maxsize=4)
+def load_ohlcv(npy_path: str):
+    """Memory-map a .npy price file; sweep workers share the pages through the OS cache."""
+    return np.load(npy_path, mmap_mode="r")
+
+
+def load_signals(csv_path: str):
+    """Read ``timestamp,direction`` rows (direction long/short or 1/-1) into (timestamps, directions) arrays."""
+    timestamps, directions = [], []
+    with open(csv_path, newline="") as signal_file:
+        for row in csv.DictReader(signal_file):
+            direction = row["direction"].strip().lower()
+            timestamps.append(float(row["timestamp"]))
+            directions.append(1 if direction in ("long", "1", "+1") else -1)
+    order = np.argsort(np.asarray(timestamps), kind="stable")
+    return np.asarray(timestamps, dtype=np.float64)[order], np.asarray(directions, dtype=np.int8)[order]
+
+
+def _first(mask):
+    """Index of the first True in ``mask``, or -1."""
+    if mask.size == 0:
+        return -1
+    index = int(np.argmax(mask))
+    return index if mask[index] else -1
+
+
+class Backtest:
+    """Replays signals through the live bracket rules over one OHLCV array.
+
+    Signals are filled at the open of the first bar at or after their timestamp.
+    Between two signals the SL/TP levels are searched with whole-slice NumPy
+    comparisons, so the Python loop runs once per fill rather than once per bar.
+    When an SL and a TP fall inside the same bar the SL is assumed to come first.
+    """
+
+    def __init__(self, ohlcv, params: dict):
+        self.timestamps = ohlcv[:, TIMESTAMP]
+        self.opens = ohlcv[:, OPEN]
+        self.highs = ohlcv[:, HIGH]
+        self.lows = ohlcv[:, LOW]
+        self.closes = ohlcv[:, CLOSE]
+        self.params = params
+        self.fills = []  # (bar, price, quantity, pnl, fee)
+        self.position_results = []
+        self.direction = 0
+        self.quantity = 0.0
+        self.average_entry = 0.0
+        self.entry_price = 0.0
+        self.openings = 0
+        self.position_net = 0.0
+        self.sl = None
+        self.tps = []
+
+    def _fill(self, bar: int, price: float, quantity: float, opening: bool):
+        fee = quantity * price * self.params["fee_rate"]
+        pnl = 0.0 if opening else (price - self.average_entry) * quantity * self.direction
+        self.fills.append((bar, price, quantity, pnl, fee))
+        self.position_net += pnl - fee
+
+    def _bracket(self, sl_distance: float):
+        half = self.quantity / 2
+        self.sl = self.entry_price * (1 - self.direction * sl_distance)
+        self.tps = [(self.entry_price * (1 + self.direction * self.params["tp1"]), half),
+                    (self.entry_price * (1 + self.direction * self.params["tp2"]), half)]
+
+    def _open(self, bar: int, direction: int):
+        price = float(self.opens[bar])
+        if self.direction == 0:
+            self.direction, self.quantity, self.openings, self.position_net = direction, self.params["quantity"], 1, 0.0
+            self.average_entry = self.entry_price = price
+            self._fill(bar, price, self.quantity, opening=True)
+            self._bracket(self.params["first_sl"])
+        elif self.openings < self.params["max_openings"]:
+            # expand_position doubles whatever is left, then the bracket is replaced around the new fill.
+            added = self.quantity
+            self._fill(bar, price, added, opening=True)
+            self.average_entry = (self.average_entry * self.quantity + price * added) / (self.quantity + added)
+            self.quantity += added
+            self.entry_price = price
+            self.openings += 1
+            self._bracket(self.params["second_sl"])
+
+    def _close(self, bar: int, price: float):
+        self._fill(bar, price, self.quantity, opening=False)
+        self.position_results.append(self.position_net)
+        self.direction, self.quantity, self.sl, self.tps = 0, 0.0, None, []
+
+    def _run_brackets(self, start: int, end: int):
+        """Apply SL/TP hits in bars [start, end) until the position closes or the range ends."""
+        while self.direction != 0 and start < end:
+            highs, lows = self.highs[start:end], self.lows[start:end]
+            if self.direction > 0:
+                sl_bar = _first(lows <= self.sl)
+                tp_bars = [_first(highs >= price) for price, quantity in self.tps]
+            else:
+                sl_bar = _first(highs >= self.sl)
+                tp_bars = [_first(lows <= price) for price, quantity in self.tps]
+            hit_tps = [offset for offset in tp_bars if offset >= 0]
+            tp_bar = min(hit_tps) if hit_tps else -1
+            if sl_bar >= 0 and (tp_bar < 0 or sl_bar <= tp_bar):
+                bar = start + sl_bar
+                open_price = float(self.opens[bar])
+                gapped = open_price < self.sl if self.direction > 0 else open_price > self.sl
+                self._close(bar, open_price if gapped else self.sl)
+                return
+            if tp_bar < 0:
+                return
+            bar = start + tp_bar
+            filled = [index for index, offset in enumerate(tp_bars) if offset == tp_bar]
+            if len(filled) == len(self.tps):
+                # The farthest TP closes the position; check_position inactivates the SL with it.
+                for price, quantity in self.tps[:-1]:
+                    self._fill(bar, price, quantity, opening=False)
+                    self.quantity -= quantity
+                self._close(bar, self.tps[-1][0])
+                return
+            for index in filled:
+                price, quantity = self.tps[index]
+                self._fill(bar, price, quantity, opening=False)
+                self.quantity -= quantity
+            self.tps = [tp for index, tp in enumerate(self.tps) if index not in filled]
+            self.sl = self.entry_price * (1 - self.direction * self.params["breakeven"])
+            start = bar + 1
+
+    def run(self, signal_timestamps, signal_directions):
+        bars = np.searchsorted(self.timestamps, signal_timestamps, side="left")
+        cursor, last = 0, len(self.timestamps)
+        for bar, direction in zip(bars.tolist(), signal_directions.tolist()):
+            if bar >= last:
+                break
+            self._run_brackets(cursor, bar)
+            if self.direction == -direction:
+                self._close(bar, float(self.opens[bar]))
+            self._open(bar, direction)
+            cursor = bar
+        self._run_brackets(cursor, last)
+        open_at_end = self.direction != 0
+        if open_at_end:
+            self._close(last - 1, float(self.closes[last - 1]))
+        return self.statistics(open_at_end)
+
+    def statistics(self, open_at_end: bool = False):
+        fills = np.asarray(self.fills, dtype=np.float64).reshape(-1, 5)
+        net = fills[:, 3] - fills[:, 4]
+        equity = np.cumsum(net)
+        peaks = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:]
+        results = np.asarray(self.position_results, dtype=np.float64)
+        return {
+            "net_pnl": float(equity[-1]) if equity.size else 0.0,
+            "gross_pnl": float(fills[:, 3].sum()),
+            "fees": float(fills[:, 4].sum()),
+            "max_drawdown": float((peaks - equity).max()) if equity.size else 0.0,
+            "volume": float((fills[:, 1] * fills[:, 2]).sum()),
+            "fills": int(len(fills)),
+            "positions": int(results.size),
+            "win_rate": float((results > 0).mean()) if results.size else 0.0,
+            "open_at_end": open_at_end,
+        }
+
+
+def run(prices_path: str, signal_timestamps, signal_directions, params: dict):
+    return Backtest(load_ohlcv(prices_path), params).run(signal_timestamps, signal_directions)
+
+
+def _run_combination(arguments):
+    prices_path, signal_timestamps, signal_directions, params = arguments
+    return params, run(prices_path, signal_timestamps, signal_directions, params)
+
+
+def sweep(prices_path: str, signal_timestamps, signal_directions, base_params: dict, grid: dict, workers: int = None):
+    """Run every combination of ``grid`` values on top of ``base_params`` across processes."""
+    names = list(grid)
+    combinations = [dict(base_params, **dict(zip(names, values))) for values in itertools.product(*grid.values())]
+    arguments = [(prices_path, signal_timestamps, signal_directions, params) for params in combinations]
+    if workers == 1 or len(arguments) == 1:
+        return [_run_combination(argument) for argument in arguments]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_combination, arguments))
@@ -0,0 +1,94 @@
+import os
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .ratelimit import PUBLIC_KEY, RateLimiter, endpoint_class, record
+
+
+class ExchangeClient:
+    """Keep-alive HTTP client for the CoinCatch REST API.
+
+    One instance owns a ``requests.Session`` whose connection pool is reused by
+    every trader in the process, so only the first call to a host pays for the
+    TCP + TLS handshake.
+    """
+
+    def __init__(self, base_url: str, connect_timeout: float, read_timeout: float,
+                 pool_connections: int, pool_maxsize: int, rate_limiter: RateLimiter = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @classmethod
+    def from_settings(cls):
+        return cls(base_url=settings.COINCATCH_BASE_URL,
+                   connect_timeout=settings.COINCATCH_CONNECT_TIMEOUT,
+                   read_timeout=settings.COINCATCH_READ_TIMEOUT,
+                   pool_connections=settings.COINCATCH_POOL_CONNECTIONS,
+                   pool_maxsize=settings.COINCATCH_POOL_MAXSIZE,
+                   rate_limiter=RateLimiter.from_settings() if settings.EXCHANGE_RATE_LIMIT_ENABLED else None)
+
+    def url(self, request_path: str, query_string: str = None):
+        if query_string is None:
+            return self.base_url + request_path
+        return self.base_url + request_path + "?" + query_string
+
+    def _throttle(self, request_path: str, headers: dict):
+        if self.rate_limiter is not None:
+            self.rate_limiter.acquire(api_key=headers.get('ACCESS-KEY', PUBLIC_KEY), request_path=request_path)
+
+    def _check_rejection(self, request_path: str, response):
+        if self.rate_limiter is not None and response.status_code == 429:
+            record(endpoint_class(request_path), "rejections")
+        return response
+
+    def get(self, request_path: str, headers: dict, query_string: str = None):
+        self._throttle(request_path, headers)
+        response = self.session.get(url=self.url(request_path, query_string), headers=headers, timeout=self.timeout)
+        return self._check_rejection(request_path, response)
+
+    def post(self, request_path: str, headers: dict, body: bytes):
+        self._throttle(request_path, headers)
+        response = self.session.post(url=self.url(request_path), data=body, headers=headers, timeout=self.timeout)
+        return self._check_rejection(request_path, response)
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> ExchangeClient:
+    """Return the process-wide client.
+
+    The pid check makes every forked Celery worker build its own pool instead of
+    sharing sockets inherited from the parent process.
+    """
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is None or _client_pid != pid:
+        with _client_lock:
+            if _client is None or _client_pid != pid:
+                _client = ExchangeClient.from_settings()
+                _client_pid = pid
+    return _client
+
+
+def reset_client():
+    """Drop the process-wide client, e.g. after pointing COINCATCH_BASE_URL at a local stub."""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
@@ -0,0 +1,65 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+
+from . import tracing
+from .models import Trader, PositionDirection
+
+logger = logging.getLogger(__name__)
+
+
+def _enter_for_trader(trader: Trader, direction: PositionDirection.type):
+    started = time.monotonic()
+    error = None
+    try:
+        with tracing.span("trader_signal", trader=trader.id, direction=direction):
+            if direction == PositionDirection.long.value:
+                trader.get_long_sign()
+            else:
+                trader.get_short_sign()
+    except Exception as ve:
+        error = ve.__str__()
+        logger.exception("Signal failed for trader", extra={"trader": trader.id, "trader_name": trader.name,
+                                                            "direction": direction})
+    finally:
+        # Every pool thread opens its own DB connection; don't leave it dangling.
+        connection.close()
+    return {
+        "trader_id": trader.id,
+        "ok": error is None,
+        "error": error,
+        "latency": time.monotonic() - started,
+    }
+
+
+def execute_signal(direction: PositionDirection.type, traders=None):
+    """Run one long/short signal for every trader concurrently.
+
+    Each trader's entry runs on a bounded thread pool, so the exchange round trips
+    of different traders overlap instead of queueing behind each other. A failing
+    trader only marks its own result as failed.
+    """
+    if direction not in (PositionDirection.long.value, PositionDirection.short.value):
+        raise ValueError(f"Unknown signal direction: {direction}")
+    if traders is None:
+        traders = list(Trader.objects.all())
+    if not traders:
+        return []
+
+    started = time.monotonic()
+    max_workers = min(settings.SIGNAL_FANOUT_WORKERS, len(traders))
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="signal") as executor:
+        # bind() per trader: each pool thread needs its own copy of the signal's trace context.
+        futures = [executor.submit(tracing.bind(_enter_for_trader), trader, direction) for trader in traders]
+        results = [future.result() for future in futures]
+
+    latencies = [result["latency"] for result in results]
+    failed = [result["trader_id"] for result in results if not result["ok"]]
+    logger.info("Signal executed", extra={"direction": direction, "traders": len(results),
+                                          "seconds": round(time.monotonic() - started, 3),
+                                          "fastest": round(min(latencies), 3), "slowest": round(max(latencies), 3),
+                                          "failed": failed})
+    return results
@@ -26,3 +26,21 @@ class WrongActionBasedOnState(Exception):
     def __init__(self):
         self.code = -103
         self.message = 'Wrong action!'
+
+
+class RateLimited(Exception):
+    def __init__(self, message):
+        self.code = -104
+        self.message = message
+
+
+class TraderBusy(Exception):
+    def __init__(self, message):
+        self.code = -105
+        self.message = message
+
+
+class StaleLease(Exception):
+    def __init__(self, message):
+        self.code = -106
+        self.message = message
@@ -0,0 +1,118 @@
+import atexit
+import copy
+import itertools
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+# Attributes every LogRecord has; anything else on a record came in through ``extra=`` and is emitted as a field.
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One compact JSON object per record: time, level, logger, message and the ``extra`` fields."""
+
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "msg": record.getMessage()}
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and key != "sample":
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, separators=(",", ":"), default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep one in ``sample`` records per message for calls made with ``extra={"sample": n}``."""
+
+    def __init__(self):
+        super().__init__()
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        rate = getattr(record, "sample", None)
+        if not rate or rate <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self.lock:
+            counter = self.counters.setdefault(key, itertools.count())
+            seen = next(counter)
+        if seen % rate:
+            return False
+        record.sampled = rate
+        return True
+
+
+class _Handler(QueueHandler):
+
+    def prepare(self, record):
+        # Like QueueHandler.prepare, but keep the traceback in its own field instead of inside the message.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _Pipeline:
+    """The queue, the handler callers enqueue to, and the listener thread that does the actual I/O."""
+
+    def __init__(self):
+        self.handler = None
+        self.listener = None
+        self.output = None
+
+    def start(self, output: logging.Handler, level: str):
+        self.output = output
+        self.handler = _Handler(queue.SimpleQueue())
+        self.handler.addFilter(SamplingFilter())
+        logger = logging.getLogger("Logic")
+        logger.setLevel(level)
+        logger.addHandler(self.handler)
+        logger.propagate = False
+        self._listen()
+        atexit.register(self.stop)
+        # A forked Celery child inherits the queue but not the listener thread: give it its own.
+        os.register_at_fork(after_in_child=self._restart_in_child)
+
+    def _listen(self):
+        self.listener = QueueListener(self.handler.queue, self.output, respect_handler_level=True)
+        self.listener.start()
+
+    def _restart_in_child(self):
+        self.handler.queue = queue.SimpleQueue()
+        self._listen()
+
+    def stop(self):
+        if self.listener is not None and self.listener._thread is not None:
+            self.listener.stop()
+
+
+_pipeline = None
+_setup_lock = threading.Lock()
+
+
+def setup(level: str = "INFO", path: str = None):
+    """Route the ``Logic`` loggers through a queue so callers never wait on stdout or the log file.
+
+    Without ``path`` records go to the process's original stdout, not to Celery's
+    redirected one, so they are not wrapped a second time by Celery's own logger.
+    """
+    global _pipeline
+    with _setup_lock:
+        if _pipeline is not None:
+            return
+        output = logging.FileHandler(path) if path else logging.StreamHandler(sys.__stdout__)
+        output.setFormatter(JsonFormatter())
+        _pipeline = _Pipeline()
+        _pipeline.start(output, level)
@@ -0,0 +1,54 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from Logic import backtest
+
+
+def parse_assignment(text: str):
+    name, _, values = text.partition("=")
+    if not values:
+        raise CommandError(f"Expected name=value, got {text!r}")
+    return name.strip(), [float(value) for value in values.split(",")]
+
+
+class Command(BaseCommand):
+    help = ("Replay a signal CSV through the bracket strategy over a memory-mapped OHLCV .npy file. "
+            "Runs offline; --sweep spreads parameter combinations over CPU cores.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--prices", required=True, help=".npy file with timestamp,open,high,low,close,volume rows")
+        parser.add_argument("--signals", required=True, help="CSV with timestamp,direction rows")
+        parser.add_argument("--from-csv", help="convert this OHLCV CSV into --prices first")
+        parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                            help="override a strategy parameter, e.g. --set fee_rate=0.0004")
+        parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2,...",
+                            help="values to try for a parameter; several --sweep give their product")
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--top", type=int, default=20, help="how many sweep results to print")
+
+    def handle(self, *args, **options):
+        if options["from_csv"]:
+            bars = backtest.convert_csv(options["from_csv"], options["prices"])
+            self.stdout.write(f"wrote {bars} bars to {options['prices']}")
+        params = backtest.default_params()
+        grid = {}
+        for text in options["set"]:
+            name, values = parse_assignment(text)
+            params[name] = values[0]
+        for text in options["sweep"]:
+            name, values = parse_assignment(text)
+            grid[name] = values
+        unknown = (set(params) | set(grid)) - set(backtest.default_params())
+        if unknown:
+            raise CommandError(f"Unknown parameters: {', '.join(sorted(unknown))}")
+
+        timestamps, directions = backtest.load_signals(options["signals"])
+        results = backtest.sweep(options["prices"], timestamps, directions, params, grid, workers=options["workers"])
+        results.sort(key=lambda result: result[1]["net_pnl"], reverse=True)
+        for combination, stats in results[:options["top"]]:
+            swept = " ".join(f"{name}={combination[name]:g}" for name in grid) or "defaults"
+            self.stdout.write(f"{swept}: net {stats['net_pnl']:.4f} gross {stats['gross_pnl']:.4f} "
+                              f"fees {stats['fees']:.4f} max_dd {stats['max_drawdown']:.4f} "
+                              f"positions {stats['positions']} win {stats['win_rate']:.1%} fills {stats['fills']}"
+                              + (" (open at end, closed at last bar)" if stats["open_at_end"] else ""))
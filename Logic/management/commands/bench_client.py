@@ -0,0 +1,56 @@
+import time
+
+import requests
+from django.core.management.base import BaseCommand
+
+from Logic.client import ExchangeClient
+from Logic.simulator import Faults, SimulatedExchange, Simulator
+
+REQUEST_PATH = "/api/mix/v1/market/mark-price"
+QUERY_STRING = "symbol=BTCUSDT_UMCBL"
+HEADERS = {'Content-Type': 'application/json', 'locale': 'en-US'}
+
+
+def _opened_connections(client: ExchangeClient):
+    adapter = client.session.get_adapter(client.base_url)
+    return sum(pool.num_connections for pool in adapter.poolmanager.pools._container.values())
+
+
+class Command(BaseCommand):
+    help = ("Measure the cost of a mark-price request, a fresh connection per call (requests.get, as before "
+            "ExchangeClient) vs the pooled keep-alive client, against a local stub server or --url")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--url", help="base URL to call instead of the local stub, e.g. https://api.coincatch.com")
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        simulator = None
+        base_url = options["url"]
+        if base_url is None:
+            simulator = Simulator(SimulatedExchange(seed=1), Faults(), tick_interval=0).start()
+            base_url = simulator.url
+        client = ExchangeClient(base_url=base_url, connect_timeout=3, read_timeout=10, pool_connections=1,
+                                pool_maxsize=1)
+        url = client.url(REQUEST_PATH, QUERY_STRING)
+        try:
+            cases = (
+                ("new connection", lambda: requests.get(url=url, headers=HEADERS, timeout=client.timeout)),
+                ("pooled client", lambda: client.get(request_path=REQUEST_PATH, headers=HEADERS,
+                                                     query_string=QUERY_STRING)),
+            )
+            for name, case in cases:
+                case().raise_for_status()  # warm up DNS and imports outside the timing
+                started = time.perf_counter()
+                for _ in range(count):
+                    case().raise_for_status()
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f"{name:>16}: {elapsed / count * 1e3:8.3f} ms/request, "
+                                  f"{count / elapsed:8.0f} requests/s")
+            self.stdout.write(f"pooled client opened {_opened_connections(client)} connection(s) "
+                              f"for {count + 1} requests")
+        finally:
+            client.close()
+            if simulator is not None:
+                simulator.stop()
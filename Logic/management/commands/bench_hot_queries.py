@@ -0,0 +1,94 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from Logic.models import (Trader, Position, PositionAction, SLTPOrder, State, PlanType, PositionDirection,
+                          SideFutures, Coin)
+
+
+class Command(BaseCommand):
+    help = ("Seed a scratch database with historical positions and time the hot Position/SLTPOrder lookups. "
+            "Run it against a throwaway DB_NAME: --seed inserts millions of rows.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", action="store_true", help="insert the historical rows first")
+        parser.add_argument("--traders", type=int, default=20)
+        parser.add_argument("--positions", type=int, default=500000, help="historical positions in total")
+        parser.add_argument("--batch", type=int, default=5000)
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def seed(self, traders, positions, batch):
+        coin = Coin.btc_futures.value
+        trader_rows = [Trader.objects.get_or_create(name=f"bench-{i}", defaults={
+            "api_key": "bench", "secret_key": "bench", "api_passphrase": "bench"})[0] for i in range(traders)]
+        for start in range(0, positions, batch):
+            size = min(batch, positions - start)
+            with transaction.atomic():
+                rows = Position.objects.bulk_create([
+                    Position(trader=random.choice(trader_rows), coin=coin, quantity=Decimal("0"),
+                             state=State.Inactive.value, direction=PositionDirection.long.value,
+                             is_ever_updated=True, number_of_openings=1)
+                    for _ in range(size)])
+                if rows[0].pk is None:
+                    # Backends without RETURNING (MySQL) don't hand back ids from bulk_create.
+                    rows = list(Position.objects.order_by('-id')[:size])
+                actions, orders = [], []
+                for position in rows:
+                    for side in (SideFutures.open_long.value, SideFutures.close_long.value):
+                        actions.append(PositionAction(position=position, trader_id=position.trader_id,
+                                                      action_side=side, price=Decimal("60000"),
+                                                      quantity=Decimal("0.002"), coin=coin, remote_id="bench",
+                                                      profit=Decimal("0"), fee=Decimal("0")))
+                    for plan_type, trigger_price in ((PlanType.sl.value, Decimal("59700")),
+                                                     (PlanType.tp.value, Decimal("60600")),
+                                                     (PlanType.tp.value, Decimal("61200"))):
+                        orders.append(SLTPOrder(trader_id=position.trader_id, position=position, coin=coin,
+                                                quantity=Decimal("0.001"), plan_type=plan_type,
+                                                trigger_price=trigger_price, state=State.Inactive.value,
+                                                remote_id="bench"))
+                PositionAction.objects.bulk_create(actions)
+                SLTPOrder.objects.bulk_create(orders)
+            self.stdout.write(f"seeded {start + size}/{positions} positions")
+        for trader in trader_rows:
+            position = Position.objects.create(trader=trader, coin=coin, quantity=Decimal("0.002"),
+                                               state=State.Active.value, direction=PositionDirection.long.value)
+            PositionAction.objects.create(position=position, trader=trader, action_side=SideFutures.open_long.value,
+                                          price=Decimal("60000"), quantity=Decimal("0.002"), coin=coin,
+                                          remote_id="bench", profit=Decimal("0"))
+            for plan_type, trigger_price in ((PlanType.sl.value, Decimal("59700")),
+                                             (PlanType.tp.value, Decimal("60600")),
+                                             (PlanType.tp.value, Decimal("61200"))):
+                SLTPOrder.objects.create(trader=trader, position=position, coin=coin, quantity=Decimal("0.001"),
+                                         plan_type=plan_type, trigger_price=trigger_price,
+                                         state=State.Active.value, remote_id="bench")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["traders"], options["positions"], options["batch"])
+
+        trader = Trader.objects.filter(name__startswith="bench-").first()
+        if trader is None:
+            self.stderr.write("No bench-* traders found, run with --seed first")
+            return
+        position = Position.objects.filter(trader=trader, state=State.Active.value).first()
+        queries = {
+            "active positions of trader": lambda: trader.position_set.filter(state=State.Active.value)
+            .order_by('-id')[:2],
+            "latest action of position": lambda: position.positionaction_set.order_by('-id')[:1],
+            "active TPs by trigger price": lambda: position.sltporder_set.filter(
+                state=State.Active.value, plan_type=PlanType.tp.value).order_by('trigger_price'),
+            "active orders of trader/coin": lambda: SLTPOrder.objects.filter(
+                trader=trader, coin=position.coin, state=State.Active.value),
+        }
+        self.stdout.write(f"{Position.objects.count()} positions, {PositionAction.objects.count()} actions, "
+                          f"{SLTPOrder.objects.count()} sltp orders")
+        for name, query in queries.items():
+            self.stdout.write(f"\n== {name}\n{query().explain()}")
+            started = time.perf_counter()
+            for _ in range(options["repeat"]):
+                list(query())
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{elapsed / options['repeat'] * 1000:.3f} ms/query")
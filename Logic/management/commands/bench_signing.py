@@ -0,0 +1,64 @@
+import base64
+import hmac
+import time
+
+from django.core.management.base import BaseCommand
+
+from Logic.signer import RequestSigner, canonical_body
+
+
+def legacy_header(api_key, secret_key, api_passphrase, method, request_path, body):
+    # What Trader.create_header did per request before RequestSigner: re-key HMAC and concatenate strings.
+    timestamp = int(time.time_ns() / 1000000)
+    message = str(timestamp) + str.upper(method) + request_path + body
+    mac = hmac.new(bytes(secret_key, encoding='utf8'), bytes(message, encoding='utf-8'), digestmod='sha256')
+    return {
+        'ACCESS-KEY': api_key,
+        'ACCESS-SIGN': base64.b64encode(mac.digest()),
+        'ACCESS-TIMESTAMP': str(timestamp),
+        'ACCESS-PASSPHRASE': api_passphrase,
+        'Content-Type': 'application/json',
+        'locale': 'en-US'
+    }
+
+
+def legacy_body(payload):
+    return (f'{{"symbol":"{payload["symbol"]}",'
+            f'"marginCoin":"USDT",'
+            f'"size":"{payload["size"]}",'
+            f'"planType":"{payload["planType"]}",'
+            f'"triggerPrice":"{payload["triggerPrice"]}",'
+            f'"holdSide":"{payload["holdSide"]}"}}')
+
+
+class Command(BaseCommand):
+    help = "Measure the cost of signing one placeTPSL request, legacy signing vs RequestSigner"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=100000)
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        api_key, secret_key, api_passphrase = "bench-key", "bench-secret-" + "x" * 52, "bench-passphrase"
+        request_path = "/api/mix/v1/plan/placeTPSL"
+        payload = {"symbol": "BTCUSDT_UMCBL", "marginCoin": "USDT", "size": "0.001", "planType": "profit_plan",
+                   "triggerPrice": "65000.0", "holdSide": "long"}
+
+        signer = RequestSigner(api_key=api_key, secret_key=secret_key, api_passphrase=api_passphrase)
+        body = canonical_body(payload)
+        text_body = body.decode()
+        cases = (
+            ("legacy sign", lambda: legacy_header(api_key, secret_key, api_passphrase, "POST", request_path,
+                                                  text_body)),
+            ("signer sign", lambda: signer.headers(method="POST", request_path=request_path, body=body)),
+            ("legacy body+sign", lambda: legacy_header(api_key, secret_key, api_passphrase, "POST", request_path,
+                                                       legacy_body(payload))),
+            ("signer body+sign", lambda: signer.headers(method="POST", request_path=request_path,
+                                                        body=canonical_body(payload))),
+        )
+        for name, case in cases:
+            started = time.perf_counter()
+            for _ in range(count):
+                case()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"{name:>16}: {elapsed / count * 1e6:8.2f} us/request, {count / elapsed:10.0f} requests/s")
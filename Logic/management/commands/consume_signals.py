@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from Logic.signal_stream import SignalConsumer
+
+
+class Command(BaseCommand):
+    help = "Execute the long/short signals accepted by the webhook views, reading them from the Redis signal stream"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--name", default=None, help="consumer name in the group, defaults to the host name")
+        parser.add_argument("--block", type=int, default=5000, help="ms to wait for new entries per read")
+
+    def handle(self, *args, **options):
+        SignalConsumer(name=options["name"], block_ms=options["block"]).run()
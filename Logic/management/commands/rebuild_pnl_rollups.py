@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from Logic.models import PnlRollup, TraderDailyPnl, TraderCoinPnl
+
+
+class Command(BaseCommand):
+    help = ("Recompute the per-trader daily and per-coin PnL rollups and Trader.pnl from PositionAction. "
+            "Migration 0010 did the same once on deploy; run this whenever actions were edited outside the bot.")
+
+    def handle(self, *args, **options):
+        PnlRollup.rebuild()
+        self.stdout.write(f"{TraderDailyPnl.objects.count()} daily rows, {TraderCoinPnl.objects.count()} coin rows")
@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Logic.simulator import Faults, SimulatedExchange, Simulator
+
+
+class Command(BaseCommand):
+    help = ("Serve a local CoinCatch stand-in for load and latency tests; point COINCATCH_BASE_URL at it. "
+            "POST /sim/price {\"price\": ...} moves the mark price, GET /sim/state shows the book.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--host", default="0.0.0.0")
+        parser.add_argument("--port", type=int, default=8090)
+        parser.add_argument("--price", type=float, default=60000.0, help="starting mark price")
+        parser.add_argument("--volatility", type=float, default=0.0005, help="std of the log return per tick")
+        parser.add_argument("--tick", type=float, default=1.0, help="seconds between price ticks, 0 to freeze")
+        parser.add_argument("--path", help="file with one price per line, replayed in a loop instead of a random walk")
+        parser.add_argument("--fee-rate", type=float, default=0.0006)
+        parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+        parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of uniform latency noise")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="share of POSTs answered with --error-code")
+        parser.add_argument("--error-code", default="43020")
+        parser.add_argument("--rate-limit", type=int, default=0, help="requests per second per key and path, 0 = off")
+        parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+        parser.add_argument("--seed", type=int, default=None)
+
+    def handle(self, *args, **options):
+        path = None
+        if options["path"]:
+            with open(options["path"]) as price_file:
+                path = [float(line) for line in price_file if line.strip()]
+        exchange = SimulatedExchange(price=options["price"], volatility=options["volatility"],
+                                     fee_rate=options["fee_rate"], path=path, seed=options["seed"])
+        faults = Faults(latency=options["latency"], jitter=options["jitter"], error_rate=options["error_rate"],
+                        error_code=options["error_code"], rate_limit=options["rate_limit"],
+                        rate_limit_rate=options["rate_limit_rate"], seed=options["seed"])
+        simulator = Simulator(exchange, faults, host=options["host"], port=options["port"],
+                              tick_interval=options["tick"]).start()
+        self.stdout.write(f"Exchange simulator listening on {simulator.url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            simulator.stop()
@@ -0,0 +1,15 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from Logic.order_stream import OrderStream
+
+
+class Command(BaseCommand):
+    help = "Consume the exchange's private plan-order stream and apply SL/TP triggers as they happen"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default=None, help="WebSocket URL, defaults to COINCATCH_WS_URL")
+
+    def handle(self, *args, **options):
+        asyncio.run(OrderStream(url=options["url"]).run())
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['trader', 'state'], name='position_trader_state_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='positionaction',
+            index=models.Index(fields=['position', 'id'], name='positionaction_position_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sltporder',
+            index=models.Index(fields=['position', 'state', 'plan_type', 'trigger_price'], name='sltporder_pos_state_plan_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sltporder',
+            index=models.Index(fields=['trader', 'coin', 'state'], name='sltporder_trdr_coin_state_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:54
+
+from django.db import migrations, models
+
+OPEN_SIDES = ("open_long", "open_short")
+
+
+def backfill_action_summary(apps, schema_editor):
+    Position = apps.get_model("Logic", "Position")
+    PositionAction = apps.get_model("Logic", "PositionAction")
+    batch = []
+    for position in Position.objects.all().iterator(chunk_size=2000):
+        opened_quantity, cost = 0, 0
+        total_fee, total_profit, entry_price = 0, 0, None
+        for action in PositionAction.objects.filter(position_id=position.id).order_by("id"):
+            if action.action_side in OPEN_SIDES:
+                opened_quantity += action.quantity
+                cost += action.price * action.quantity
+                entry_price = action.price
+            total_fee += action.fee
+            total_profit += action.profit
+        position.entry_price = entry_price
+        position.average_entry_price = cost / opened_quantity if opened_quantity else None
+        position.opened_quantity = opened_quantity
+        position.total_fee = total_fee
+        position.total_profit = total_profit
+        batch.append(position)
+        if len(batch) >= 2000:
+            Position.objects.bulk_update(batch, ["entry_price", "average_entry_price", "opened_quantity",
+                                                 "total_fee", "total_profit"])
+            batch = []
+    if batch:
+        Position.objects.bulk_update(batch, ["entry_price", "average_entry_price", "opened_quantity",
+                                             "total_fee", "total_profit"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0002_hot_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='position',
+            name='average_entry_price',
+            field=models.DecimalField(blank=True, decimal_places=3, max_digits=12, null=True),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='entry_price',
+            field=models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='opened_quantity',
+            field=models.DecimalField(decimal_places=3, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='total_fee',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name='position',
+            name='total_profit',
+            field=models.DecimalField(decimal_places=5, default=0, max_digits=10),
+        ),
+        migrations.RunPython(backfill_action_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.7 on 2026-10-18 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0003_position_action_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraderCoinPnl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('trace', models.TextField(blank=True, null=True)),
+                ('profit', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('fee', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('volume', models.DecimalField(decimal_places=5, default=0, max_digits=18)),
+                ('number_of_fills', models.IntegerField(default=0)),
+                ('coin', models.CharField(choices=[(str, 'type'), ('BTCUSDT_SPBL', 'btc_spot'), ('BTCUSDT_UMCBL', 'btc_futures')], max_length=50)),
+                ('trader', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='Logic.trader')),
+            ],
+            options={
+                'unique_together': {('trader', 'coin')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TraderDailyPnl',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('trace', models.TextField(blank=True, null=True)),
+                ('profit', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('fee', models.DecimalField(decimal_places=5, default=0, max_digits=14)),
+                ('volume', models.DecimalField(decimal_places=5, default=0, max_digits=18)),
+                ('number_of_fills', models.IntegerField(default=0)),
+                ('day', models.DateField()),
+                ('trader', models.ForeignKey(on_delete=django.db.models.deletion.DO_NOTHING, to='Logic.trader')),
+            ],
+            options={
+                'unique_together': {('trader', 'day')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0004_pnl_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trader',
+            name='fence_token',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
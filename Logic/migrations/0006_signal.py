@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0005_trader_fence_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Signal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('trace', models.TextField(blank=True, null=True)),
+                ('idempotency_key', models.CharField(max_length=100)),
+                ('direction', models.CharField(choices=[(str, 'type'), ('long', 'long'), ('short', 'short')], max_length=50)),
+                ('status', models.CharField(choices=[(str, 'type'), ('received', 'received'), ('executed', 'executed'), ('superseded', 'superseded'), ('failed', 'failed')], default='received', max_length=20)),
+                ('trace_id', models.CharField(blank=True, max_length=32, null=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'unique_together': {('idempotency_key',)},
+            },
+        ),
+    ]
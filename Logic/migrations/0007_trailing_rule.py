@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0006_signal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrailingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('trace', models.TextField(blank=True, null=True)),
+                ('distance', models.DecimalField(decimal_places=1, max_digits=10)),
+                ('step', models.DecimalField(decimal_places=1, max_digits=10)),
+                ('activation_price', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('best_price', models.DecimalField(blank=True, decimal_places=1, max_digits=10, null=True)),
+                ('state', models.IntegerField(choices=[(int, 'type'), (1, 'Active'), (2, 'Inactive'), (3, 'Pending')], default=1)),
+                ('position', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, to='Logic.position')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
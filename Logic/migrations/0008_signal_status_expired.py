@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0007_trailing_rule'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='signal',
+            name='status',
+            field=models.CharField(choices=[(str, 'type'), ('received', 'received'), ('executed', 'executed'), ('superseded', 'superseded'), ('failed', 'failed'), ('expired', 'expired')], default='received', max_length=20),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.7 on 2026-10-18 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Logic', '0008_signal_status_expired'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='position',
+            index=models.Index(fields=['state', 'id'], name='position_state_id_idx'),
+        ),
+    ]
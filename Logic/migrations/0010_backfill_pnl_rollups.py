@@ -0,0 +1,41 @@
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    # Same aggregation as PnlRollup.rebuild(), against the historical models.
+    PositionAction = apps.get_model("Logic", "PositionAction")
+    Trader = apps.get_model("Logic", "Trader")
+    TraderDailyPnl = apps.get_model("Logic", "TraderDailyPnl")
+    TraderCoinPnl = apps.get_model("Logic", "TraderCoinPnl")
+    volume = ExpressionWrapper(F("price") * F("quantity"),
+                               output_field=models.DecimalField(max_digits=18, decimal_places=5))
+    totals = {"profit": Sum("profit"), "fee": Sum("fee"), "volume": Sum(volume), "number_of_fills": Count("id")}
+    TraderDailyPnl.objects.all().delete()
+    TraderCoinPnl.objects.all().delete()
+    TraderDailyPnl.objects.bulk_create(
+        [TraderDailyPnl(**row) for row in PositionAction.objects.annotate(day=TruncDate("created"))
+         .values("trader_id", "day").annotate(**totals).order_by()], batch_size=2000)
+    TraderCoinPnl.objects.bulk_create(
+        [TraderCoinPnl(**row) for row in PositionAction.objects.values("trader_id", "coin")
+         .annotate(**totals).order_by()], batch_size=2000)
+    pnl = {row["trader_id"]: row["profit"] + row["fee"]
+           for row in TraderCoinPnl.objects.values("trader_id").annotate(profit=Sum("profit"), fee=Sum("fee"))}
+    traders = list(Trader.objects.all())
+    for trader in traders:
+        trader.pnl = pnl.get(trader.id, Decimal("0"))
+    Trader.objects.bulk_update(traders, ["pnl"], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("Logic", "0009_position_state_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
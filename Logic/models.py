@@ -1,19 +1,32 @@
-from datetime import datetime
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
 from enum import Enum
 
+from django.conf import settings
 from django.core.cache import cache
 from django.db import models, transaction
-import requests
-import os
+from django.db.models import Count, ExpressionWrapper, F, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+from django.utils.functional import cached_property
 import time
-import hmac
-import hashlib
-import base64
 
-from .tasks import monitoring_sltp_orders
+from . import active_positions, tracing, trigger_book
+from .client import get_client
+from .price_feed import get_cached_price, publish_price
+from .signer import RequestSigner, canonical_body
+from .trader_lock import TraderLease
 from .utils import get_param, interpret_response
 
+logger = logging.getLogger(__name__)
+
+
+def _log_response(trader, request_path: str, response):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Exchange response", extra={"trader": trader.id, "path": request_path,
+                                                 "status": response.status_code, "body": response.text})
+
 
 class Coin(Enum):
     type = str
@@ -65,6 +78,27 @@ class PlanType(Enum):
         return [(key.value, key.name) for key in cls]
 
 
+class PlanStatus(Enum):
+    type = str
+    not_triggered = "not_trigger"
+    triggered = "triggered"
+    fail_triggered = "fail_trigger"
+    cancel = "cancel"
+
+
+class SignalStatus(Enum):
+    type = str
+    received = "received"
+    executed = "executed"
+    superseded = "superseded"
+    failed = "failed"
+    expired = "expired"
+
+    @classmethod
+    def choices(cls):
+        return [(key.value, key.name) for key in cls]
+
+
 class State(Enum):
     type = int
     Active = 1
@@ -76,6 +110,19 @@ class State(Enum):
         return [(key.value, key.name) for key in cls]
 
 
+FIRST_OPENING_QUANTITY = Decimal("0.002")
+
+# (sl, tp1, tp2) trigger prices as ratios of the entry price, per direction of the position
+FIRST_BRACKET_RATIOS = {
+    PositionDirection.long.value: (Decimal("0.995"), Decimal("1.01"), Decimal("1.02")),
+    PositionDirection.short.value: (Decimal("1.005"), Decimal("0.99"), Decimal("0.98")),
+}
+SECOND_BRACKET_RATIOS = {
+    PositionDirection.long.value: (Decimal("0.991"), Decimal("1.01"), Decimal("1.02")),
+    PositionDirection.short.value: (Decimal("1.009"), Decimal("0.99"), Decimal("0.98")),
+}
+
+
 class BaseModel(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
@@ -91,6 +138,11 @@ class Trader(BaseModel):
     secret_key = models.CharField(max_length=100)
     api_passphrase = models.CharField(max_length=100)
     pnl = models.DecimalField(max_digits=10, decimal_places=5, default=0, null=True, blank=True)
+    # Highest TraderLease fencing token handed out for this trader
+    fence_token = models.BigIntegerField(default=0)
+
+    # The TraderLease this instance currently acts under, if any
+    lease = None
 
     class Meta:
         unique_together = (('name',),)
@@ -98,39 +150,16 @@ class Trader(BaseModel):
     def __str__(self):
         return self.name
 
-    def sign(self, message, secret_key):
-        mac = hmac.new(bytes(secret_key, encoding='utf8'), bytes(message, encoding='utf-8'), digestmod='sha256')
-        d = mac.digest()
-        return base64.b64encode(d)
+    def check_lease(self):
+        if self.lease is not None:
+            self.lease.check()
 
-    def pre_hash(self, timestamp, method, request_path, body=None, query_string=None):
-        if query_string is None:
-            return str(timestamp) + str.upper(method) + request_path + body
-        else:
-            return str(timestamp) + str.upper(method) + request_path + "?" + query_string
-
-    def create_signature(self, timestamp, method, request_path, body=None, query_string=None):
-        message = self.pre_hash(timestamp=str(timestamp), method=method, request_path=request_path, body=body,
-                                query_string=query_string)
-        signature_b64 = self.sign(message, self.secret_key)
-        return signature_b64
-
-    def create_header(self, method, request_path, body=None, query_string=None):
-        timestamp = int(time.time_ns() / 1000000)
-        signature_b64 = self.create_signature(timestamp=str(timestamp),
-                                              method=method,
-                                              request_path=request_path,
-                                              body=body,
-                                              query_string=query_string)
-        headers = {
-            'ACCESS-KEY': self.api_key,
-            'ACCESS-SIGN': signature_b64,
-            'ACCESS-TIMESTAMP': str(timestamp),
-            'ACCESS-PASSPHRASE': self.api_passphrase,
-            'Content-Type': 'application/json',
-            'locale': 'en-US'
-        }
-        return headers
+    @cached_property
+    def signer(self):
+        return RequestSigner(api_key=self.api_key, secret_key=self.secret_key, api_passphrase=self.api_passphrase)
+
+    def create_header(self, method, request_path, body: bytes = b"", query_string=None):
+        return self.signer.headers(method=method, request_path=request_path, body=body, query_string=query_string)
 
     # def spot_trade(self, quantity: Decimal, side: Side, price: Decimal, coin: Coin):
     #     method = "POST"
@@ -149,21 +178,19 @@ class Trader(BaseModel):
     #     print(response.text)
     #     return response
 
-    def futures_trade(self, coin: Coin.type, quantity: Decimal, side: SideFutures.type):
+    def futures_trade(self, coin: Coin.type, quantity: Decimal, side: SideFutures.type, reverse: bool = False):
         method = "POST"
         request_path = "/api/mix/v1/order/placeOrder"
-        body = (f'{{"side":"{side}",'
-                f'"symbol":"{coin}",'
-                f'"orderType":"market",'
-                f'"marginCoin":"USDT",'
-                f'"size":"{quantity}"}}')
-
+        payload = {"side": side, "symbol": coin, "orderType": "market", "marginCoin": "USDT", "size": str(quantity)}
+        if reverse:
+            payload["reverse"] = True
+        self.check_lease()
+        body = canonical_body(payload)
         headers = self.create_header(method=method, request_path=request_path, body=body)
-        response = requests.post(url="https://api.coincatch.com/api/mix/v1/order/placeOrder",
-                                 data=body,
-                                 headers=headers)
+        with tracing.span("market_order", trader=self.id, side=side):
+            response = get_client().post(request_path=request_path, headers=headers, body=body)
         remote_id = interpret_response(response.json(), "orderId")
-        print(response.text)
+        _log_response(self, request_path, response)
         return remote_id
 
     # def change_leverage(self, coin: Coin, leverage: int, direction: PositionDirection):
@@ -187,35 +214,31 @@ class Trader(BaseModel):
                    quantity: Decimal):
         method = "POST"
         request_path = "/api/mix/v1/plan/placeTPSL"
-        body = (f'{{"symbol":"{coin}",'
-                f'"marginCoin":"USDT",'
-                f'"size":"{quantity}",'
-                f'"planType":"{plan_type}",'
-                f'"triggerPrice":"{round(trigger_price, 1)}",'
-                f'"holdSide":"{direction}"}}')
+        body = canonical_body({"symbol": coin,
+                               "marginCoin": "USDT",
+                               "size": str(quantity),
+                               "planType": plan_type,
+                               "triggerPrice": str(round(trigger_price, 1)),
+                               "holdSide": direction})
         headers = self.create_header(method=method, request_path=request_path, body=body)
-        response = requests.post(url="https://api.coincatch.com/api/mix/v1/plan/placeTPSL",
-                                 data=body,
-                                 headers=headers)
-        print(response.text)
+        with tracing.span("sltp_place", trader=self.id, plan_type=plan_type):
+            response = get_client().post(request_path=request_path, headers=headers, body=body)
+        _log_response(self, request_path, response)
         remote_id = interpret_response(response.json(), "orderId")
         return remote_id
 
     def modify_sltp(self, sltporder, trigger_price: Decimal):
         method = "POST"
         request_path = "/api/mix/v1/plan/modifyTPSLPlan"
-        body = (f'{{"symbol":"{sltporder.coin}",'
-                f'"marginCoin":"USDT",'
-                f'"planType":"{sltporder.plan_type}",'
-                f'"triggerPrice":"{round(trigger_price, 1)}",'
-                f'"orderId":"{sltporder.remote_id}"}}')
+        body = canonical_body({"symbol": sltporder.coin,
+                               "marginCoin": "USDT",
+                               "planType": sltporder.plan_type,
+                               "triggerPrice": str(round(trigger_price, 1)),
+                               "orderId": sltporder.remote_id})
         headers = self.create_header(method=method, request_path=request_path, body=body)
-        response = requests.post(url="https://api.coincatch.com/api/mix/v1/plan/modifyTPSLPlan",
-                                 data=body,
-                                 headers=headers)
-        print(response.text)
+        response = get_client().post(request_path=request_path, headers=headers, body=body)
+        _log_response(self, request_path, response)
         response_code = response.json().get('code', None)
-        print(f"response_code is {response_code}")
         if response.status_code == 200:
             if response_code == '00000':
                 return True
@@ -227,45 +250,57 @@ class Trader(BaseModel):
     def cancel_sltp(self, sltporder):
         method = "POST"
         request_path = "/api/mix/v1/plan/cancelPlan"
-        body = (f'{{"symbol":"{sltporder.coin}",'
-                f'"marginCoin":"USDT",'
-                f'"planType":"{sltporder.plan_type}",'
-                f'"orderId":"{sltporder.remote_id}"}}')
+        body = canonical_body({"symbol": sltporder.coin,
+                               "marginCoin": "USDT",
+                               "planType": sltporder.plan_type,
+                               "orderId": sltporder.remote_id})
+        headers = self.create_header(method=method, request_path=request_path, body=body)
+        response = get_client().post(request_path=request_path, headers=headers, body=body)
+        _log_response(self, request_path, response)
+        if response.status_code == 200:
+            return True
+        else:
+            return False
+
+    def cancel_symbol_plans(self, coin: Coin.type, plan_type: PlanType.type):
+        method = "POST"
+        request_path = "/api/mix/v1/plan/cancelSymbolPlan"
+        body = canonical_body({"symbol": coin, "marginCoin": "USDT", "planType": plan_type})
         headers = self.create_header(method=method, request_path=request_path, body=body)
-        response = requests.post(url="https://api.coincatch.com/api/mix/v1/plan/cancelPlan",
-                                 data=body,
-                                 headers=headers)
-        print(response.text)
+        response = get_client().post(request_path=request_path, headers=headers, body=body)
+        _log_response(self, request_path, response)
         if response.status_code == 200:
             return True
         else:
             return False
 
-    def get_price(self, coin: Coin.type):
+    def get_price(self, coin: Coin.type, max_staleness: float = None):
+        if max_staleness is None:
+            max_staleness = settings.PRICE_FEED_MAX_STALENESS
+        price = get_cached_price(coin=coin, max_staleness=max_staleness)
+        if price is not None:
+            return price
         method = "GET"
         request_path = "/api/mix/v1/market/mark-price"
         query_string = f'symbol={coin}'
         headers = self.create_header(method=method, request_path=request_path, query_string=query_string)
-        response = requests.get(url="https://api.coincatch.com/api/mix/v1/market/mark-price" + "?" + query_string,
-                                headers=headers)
-        print(response.text)
+        response = get_client().get(request_path=request_path, headers=headers, query_string=query_string)
+        _log_response(self, request_path, response)
         if response.status_code != 200:
             raise Exception("Error in get price!")
-        return Decimal(response.json().get('data').get('markPrice'))
+        price = Decimal(response.json().get('data').get('markPrice'))
+        publish_price(coin=coin, price=price)
+        return price
 
-    def get_position_order_information(self, coin: Coin.type, remote_id: str):
+    def get_order_fills(self, coin: Coin.type, remote_id: str):
         method = "GET"
         request_path = "/api/mix/v1/order/fills"
         query_string = f'symbol={coin}&orderId={remote_id}'
         headers = self.create_header(method=method, request_path=request_path, query_string=query_string)
-        response = requests.get(url="https://api.coincatch.com/api/mix/v1/order/fills" + "?" + query_string,
-                                headers=headers)
-        print(response.json())
-        try:
-            data = interpret_response(dictionary=response.json())[0]
-        except IndexError:
-            raise Exception("No order found")
-        output = {
+        with tracing.span("fills_fetch", trader=self.id, order=remote_id):
+            response = get_client().get(request_path=request_path, headers=headers, query_string=query_string)
+        _log_response(self, request_path, response)
+        return [{
             "price": get_param(data, "price"),
             "quantity": get_param(data, "sizeQty"),
             "fee": get_param(data, "fee"),
@@ -273,142 +308,157 @@ class Trader(BaseModel):
             "profit": get_param(data, "profit"),
             "side": get_param(data, "side"),
             "created": get_param(data, "cTime"),
-        }
-        return output
+        } for data in interpret_response(dictionary=response.json())]
+
+    def get_position_order_information(self, coin: Coin.type, remote_id: str):
+        fills = self.get_order_fills(coin=coin, remote_id=remote_id)
+        if not fills:
+            raise Exception("No order found")
+        return fills[0]
 
     def get_sltp_order_information(self, coin: Coin.type, remote_id: str):
         method = "GET"
         request_path = "/api/mix/v1/order/detail"
         query_string = f'symbol={coin}&orderId={remote_id}'
         headers = self.create_header(method=method, request_path=request_path, query_string=query_string)
-        response = requests.get(url="https://api.coincatch.com/api/mix/v1/order/detail" + "?" + query_string,
-                                headers=headers)
-        print(response.json())
+        response = get_client().get(request_path=request_path, headers=headers, query_string=query_string)
+        _log_response(self, request_path, response)
+
+    def get_current_plans(self, coin: Coin.type):
+        method = "GET"
+        request_path = "/api/mix/v1/plan/currentPlan"
+        query_string = f'symbol={coin}&isPlan=profit_loss'
+        headers = self.create_header(method=method, request_path=request_path, query_string=query_string)
+        response = get_client().get(request_path=request_path, headers=headers, query_string=query_string)
+        _log_response(self, request_path, response)
+        if response.status_code != 200:
+            raise Exception("Error in get current plans!")
+        return interpret_response(dictionary=response.json())
+
+    def get_history_plans(self, coin: Coin.type, start_time: int, end_time: int, wanted_ids=None):
+        """Plans of ``coin`` created in the window, newest first, following the pages with ``lastEndId``.
+
+        With ``wanted_ids`` the paging stops as soon as all of those plans were seen.
+        """
+        method = "GET"
+        request_path = "/api/mix/v1/plan/historyPlan"
+        page_size = settings.HISTORY_PLAN_PAGE_SIZE
+        plans, wanted, last_end_id = [], set(wanted_ids or ()), None
+        for _ in range(settings.HISTORY_PLAN_MAX_PAGES):
+            query_string = f'symbol={coin}&startTime={start_time}&endTime={end_time}&pageSize={page_size}' \
+                           f'&isPlan=profit_loss'
+            if last_end_id is not None:
+                query_string += f'&lastEndId={last_end_id}'
+            headers = self.create_header(method=method, request_path=request_path, query_string=query_string)
+            response = get_client().get(request_path=request_path, headers=headers, query_string=query_string)
+            _log_response(self, request_path, response)
+            if response.status_code != 200:
+                raise Exception("Error in get history plans!")
+            page_plans = interpret_response(dictionary=response.json())
+            plans.extend(page_plans)
+            wanted.difference_update(plan.get("orderId") or plan.get("id") for plan in page_plans)
+            if len(page_plans) < page_size or (wanted_ids and not wanted):
+                return plans
+            last_end_id = page_plans[-1].get("orderId") or page_plans[-1].get("id")
+        logger.warning("History plans cut at the page limit", extra={"trader": self.id, "coin": coin,
+                                                                     "pages": settings.HISTORY_PLAN_MAX_PAGES})
+        return plans
+
+    @staticmethod
+    def _bracket_legs(position, entry_price: Decimal, sl_ratio: Decimal, tp_ratio_1: Decimal, tp_ratio_2: Decimal):
+        return [
+            (PlanType.sl.value, entry_price * sl_ratio, position.quantity),
+            (PlanType.tp.value, entry_price * tp_ratio_1, position.quantity / Decimal("2")),
+            (PlanType.tp.value, entry_price * tp_ratio_2, position.quantity / Decimal("2")),
+        ]
+
+    def _place_brackets(self, position, sl_ratio: Decimal, tp_ratio_1: Decimal, tp_ratio_2: Decimal):
+        legs = self._bracket_legs(position=position, entry_price=position.entry_price, sl_ratio=sl_ratio,
+                                  tp_ratio_1=tp_ratio_1, tp_ratio_2=tp_ratio_2)
+        sltp_orders = SLTPOrder.create_bracket(trader=self, position=position, coin=Coin.btc_futures.value, legs=legs)
+        tracing.milestone("protected", trader=self.id, position=position.id)
+        TrailingRule.attach(position)
+        return sltp_orders
 
     def _create_first_time_go_long(self):
         position = Position.create_new_position(trader=self, coin=Coin.btc_futures.value,
-                                                quantity=Decimal("0.002"), side=SideFutures.open_long.value)
-        position_action = position.positionaction_set.last()
-        sl_price = position_action.price * Decimal("0.995")
-        tp_price_1 = position_action.price * Decimal("1.01")
-        tp_price_2 = position_action.price * Decimal("1.02")
-
-        print(position.quantity)
-        sl_order = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                   trigger_price=sl_price, quantity=position.quantity,
-                                                   plan_type=PlanType.sl.value)
-        tp_order_1 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_1,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-        tp_order_2 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_2,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-        monitoring_sltp_orders.apply_async(args=[position.id])
+                                                quantity=FIRST_OPENING_QUANTITY, side=SideFutures.open_long.value)
+        self._place_brackets(position, *FIRST_BRACKET_RATIOS[PositionDirection.long.value])
         # check_position_one_hour_later.apply_async(args=[position.id])
 
     def _create_second_time_go_long(self, position):
         position.expand_position(quantity=position.quantity)
-        print(f" mewooa  {position.state}")
         position.cancel_all_sltp_orders()
-        position_action = position.positionaction_set.last()
-        sl_price = position_action.price * Decimal("0.991")
-        tp_price_1 = position_action.price * Decimal("1.01")
-        tp_price_2 = position_action.price * Decimal("1.02")
-        sl_order = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                   trigger_price=sl_price, quantity=position.quantity,
-                                                   plan_type=PlanType.sl.value)
-        tp_order_1 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_1,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-        tp_order_2 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_2,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
+        self._place_brackets(position, *SECOND_BRACKET_RATIOS[PositionDirection.long.value])
 
     def _create_first_time_go_short(self):
         position = Position.create_new_position(trader=self, coin=Coin.btc_futures.value,
-                                                quantity=Decimal("0.002"), side=SideFutures.open_short.value)
-        position_action = position.positionaction_set.last()
-        sl_price = position_action.price * Decimal("1.005")
-        tp_price_1 = position_action.price * Decimal("0.99")
-        tp_price_2 = position_action.price * Decimal("0.98")
-
-        sl_order = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                   trigger_price=sl_price, quantity=position.quantity,
-                                                   plan_type=PlanType.sl.value)
-        tp_order_1 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_1,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-        tp_order_2 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_2,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-
-        monitoring_sltp_orders.apply_async(args=[position.id])
+                                                quantity=FIRST_OPENING_QUANTITY, side=SideFutures.open_short.value)
+        self._place_brackets(position, *FIRST_BRACKET_RATIOS[PositionDirection.short.value])
         # check_position_one_hour_later.apply_async(args=[position.id])
 
     def _create_second_time_go_short(self, position):
         position.expand_position(quantity=position.quantity)
         position.cancel_all_sltp_orders()
-        position_action = position.positionaction_set.last()
-        sl_price = position_action.price * Decimal("1.009")
-        tp_price_1 = position_action.price * Decimal("0.99")
-        tp_price_2 = position_action.price * Decimal("0.98")
-        sl_order = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                   trigger_price=sl_price, quantity=position.quantity,
-                                                   plan_type=PlanType.sl.value)
-        tp_order_1 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_1,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
-        tp_order_2 = SLTPOrder.create_new_sltp_order(trader=self, position=position, coin=Coin.btc_futures.value,
-                                                     trigger_price=tp_price_2,
-                                                     quantity=position.quantity / Decimal("2"),
-                                                     plan_type=PlanType.tp.value)
+        self._place_brackets(position, *SECOND_BRACKET_RATIOS[PositionDirection.short.value])
+
+    def _can_reverse(self, position):
+        # A reverse order opens as much as it closes, so it only matches the strategy for an untouched first opening.
+        return settings.REVERSE_POSITION_MODE and position.quantity == FIRST_OPENING_QUANTITY
 
     def get_long_sign(self):
-        active_positions = self.position_set.filter(state=State.Active.value)
-        number = active_positions.count()
-        print(f"number of active_positions: {number}")
+        # Signals of one trader run one at a time across all workers; the lease is taken before any exchange call.
+        with TraderLease(self):
+            self._go_long()
+
+    def _go_long(self):
+        # One (trader, state) index read; two rows are enough to tell "more than one".
+        active_positions = list(self.position_set.filter(state=State.Active.value).order_by('-id')[:2])
+        number = len(active_positions)
+        logger.debug("Active positions before long signal", extra={"trader": self.id, "count": number})
         if number > 1:
             raise Exception(f"Not suitable number of active positions: {number}!")
         elif number == 1:
-            position = active_positions.last()
+            position = active_positions[0]
             if position.direction == PositionDirection.short.value:
-                position.close_position()
-                self._create_first_time_go_long()
+                if self._can_reverse(position):
+                    position.reverse_position()
+                else:
+                    position.close_position()
+                    self._create_first_time_go_long()
             elif position.direction == PositionDirection.long.value:
-                with transaction.atomic():
-                    position = Position.objects.filter(id=position.id).select_for_update().get()
-                    if position.number_of_openings >= 2:
-                        return
-                    else:
-                        self._create_second_time_go_long(position=position)
+                # Read under the lease, so no row lock has to stay open across the exchange calls.
+                if position.number_of_openings >= 2:
+                    return
+                self._create_second_time_go_long(position=position)
         else:
             self._create_first_time_go_long()
 
     def get_short_sign(self):
-        active_positions = self.position_set.filter(state=State.Active.value)
-        number = active_positions.count()
-        print(f"number of active_positions: {number}")
+        # Signals of one trader run one at a time across all workers; the lease is taken before any exchange call.
+        with TraderLease(self):
+            self._go_short()
+
+    def _go_short(self):
+        # One (trader, state) index read; two rows are enough to tell "more than one".
+        active_positions = list(self.position_set.filter(state=State.Active.value).order_by('-id')[:2])
+        number = len(active_positions)
+        logger.debug("Active positions before short signal", extra={"trader": self.id, "count": number})
         if number > 1:
             raise Exception(f"Not suitable number of active positions: {number}!")
         elif number == 1:
-            position = active_positions.last()
+            position = active_positions[0]
             if position.direction == PositionDirection.long.value:
-                position.close_position()
-                self._create_first_time_go_short()
+                if self._can_reverse(position):
+                    position.reverse_position()
+                else:
+                    position.close_position()
+                    self._create_first_time_go_short()
             elif position.direction == PositionDirection.short.value:
-                with transaction.atomic():
-                    position = Position.objects.filter(id=position.id).select_for_update().get()
-                    if position.number_of_openings >= 2:
-                        return
-                    else:
-                        self._create_second_time_go_short(position=position)
+                # Read under the lease, so no row lock has to stay open across the exchange calls.
+                if position.number_of_openings >= 2:
+                    return
+                self._create_second_time_go_short(position=position)
         else:
             self._create_first_time_go_short()
 
@@ -428,12 +478,43 @@ class Position(BaseModel):
     )
     is_ever_updated = models.BooleanField(default=False)
     number_of_openings = models.IntegerField(default=0)
+    # Kept in step with PositionAction rows by update_position_and_create_position_action
+    entry_price = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    average_entry_price = models.DecimalField(max_digits=12, decimal_places=3, null=True, blank=True)
+    opened_quantity = models.DecimalField(max_digits=10, decimal_places=3, default=0)
+    total_fee = models.DecimalField(max_digits=10, decimal_places=5, default=0)
+    total_profit = models.DecimalField(max_digits=10, decimal_places=5, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["trader", "state"], name="position_trader_state_idx"),
+            models.Index(fields=["state", "id"], name="position_state_id_idx"),
+        ]
 
     def __str__(self):
         return f'{self.trader.name} {self.direction}'
 
-    def update_position_and_create_position_action(self, remote_id: str):
-        order_detail = self.trader.get_position_order_information(coin=self.coin, remote_id=remote_id)
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "state" in update_fields:
+            # Counters follow what was committed; a rolled back save must not move them.
+            transaction.on_commit(lambda: active_positions.sync_position(self))
+
+    def apply_action_summary(self, side: SideFutures.type, price: Decimal, quantity: Decimal, fee: Decimal,
+                             profit: Decimal):
+        if side == SideFutures.open_long.value or side == SideFutures.open_short.value:
+            opened_quantity = self.opened_quantity + quantity
+            previous_cost = (self.average_entry_price or 0) * self.opened_quantity
+            self.average_entry_price = (previous_cost + price * quantity) / opened_quantity
+            self.opened_quantity = opened_quantity
+            self.entry_price = price
+        self.total_fee += fee
+        self.total_profit += profit
+
+    def update_position_and_create_position_action(self, remote_id: str, order_detail: dict = None):
+        if order_detail is None:
+            order_detail = self.trader.get_position_order_information(coin=self.coin, remote_id=remote_id)
         price = Decimal(order_detail.get('price'))
         fee = Decimal(order_detail.get('fee'))
         quantity = Decimal(order_detail.get('quantity'))
@@ -444,7 +525,7 @@ class Position(BaseModel):
                 and side != SideFutures.close_long.value and side != SideFutures.close_short.value:
             side = SideFutures.unknown.value
 
-        with transaction.atomic():
+        with tracing.span("db_commit", trader=self.trader_id, position=self.id), transaction.atomic():
             position_action = PositionAction.objects.create(position=self, trader=self.trader, price=price,
                                                             fee=fee, quantity=quantity, remote_id=remote_id,
                                                             profit=profit, coin=self.coin, action_side=side
@@ -460,14 +541,18 @@ class Position(BaseModel):
                 else:
                     pass
 
-            print(f"quantity: {quantity}")
-            print(f"pos_quantity: {pos_quantity}")
             if pos_quantity <= 0:
                 self.state = State.Inactive.value
             self.quantity = pos_quantity
             self.pnl += profit + fee
-            self.save(update_fields=["quantity", "pnl", "is_ever_updated", "state", "updated"])
-            print(f"STATE NOW IS {self.state}")
+            self.apply_action_summary(side=side, price=price, quantity=quantity, fee=fee, profit=profit)
+            PnlRollup.record(position_action)
+            self.save(update_fields=["quantity", "pnl", "is_ever_updated", "state", "entry_price",
+                                     "average_entry_price", "opened_quantity", "total_fee", "total_profit",
+                                     "updated"])
+            logger.info("Position updated", extra={"trader": self.trader_id, "position": self.id, "side": side,
+                                                   "quantity": quantity, "position_quantity": self.quantity,
+                                                   "state": self.state})
             return position_action
 
     @staticmethod
@@ -495,6 +580,88 @@ class Position(BaseModel):
         self.state = State.Inactive.value
         self.save(update_fields=['state', 'updated'])
 
+    @staticmethod
+    def _merge_fills(fills):
+        quantity = sum(Decimal(fill.get('quantity')) for fill in fills)
+        return {
+            "price": sum(Decimal(fill.get('price')) * Decimal(fill.get('quantity')) for fill in fills) / quantity,
+            "quantity": quantity,
+            "fee": sum(Decimal(fill.get('fee')) for fill in fills),
+            "profit": sum(Decimal(fill.get('profit')) for fill in fills),
+            "side": fills[0].get('side'),
+        }
+
+    def _get_reverse_fills(self, remote_id: str):
+        close_sides = (SideFutures.close_long.value, SideFutures.close_short.value)
+        for attempt in range(settings.REVERSE_FILLS_ATTEMPTS):
+            fills = self.trader.get_order_fills(coin=self.coin, remote_id=remote_id)
+            close_fills = [fill for fill in fills if fill.get('side') in close_sides]
+            open_fills = [fill for fill in fills if fill.get('side') not in close_sides]
+            if close_fills and open_fills:
+                return self._merge_fills(close_fills), self._merge_fills(open_fills)
+            time.sleep(settings.REVERSE_FILLS_RETRY_DELAY)
+        raise Exception(f"Fills of reverse order {remote_id} not found")
+
+    def reverse_position(self):
+        """Close this position and open the opposite one with a single reverse order.
+
+        The new brackets are priced off the current mark price and placed while the
+        fills are still being fetched; both sides are recorded from the one order's fills.
+        If those fills never show up, the reverse is still recorded (this position closed,
+        the new one at the mark price) and the error is raised afterwards.
+        """
+        if self.direction == PositionDirection.long.value:
+            side, new_direction = SideFutures.close_long.value, PositionDirection.short.value
+        else:
+            side, new_direction = SideFutures.close_short.value, PositionDirection.long.value
+        remote_id = self.trader.futures_trade(coin=self.coin, quantity=self.quantity, side=side, reverse=True)
+        entry_price = self.trader.get_price(coin=self.coin)
+        new_position = Position.objects.create(trader=self.trader, coin=self.coin, quantity=self.quantity,
+                                               state=State.Active.value, direction=new_direction,
+                                               number_of_openings=1)
+        legs = Trader._bracket_legs(new_position, entry_price, *FIRST_BRACKET_RATIOS[new_direction])
+
+        bracket_error = fills_error = None
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            fills = executor.submit(tracing.bind(self._get_reverse_fills), remote_id=remote_id)
+            try:
+                sltp_orders = SLTPOrder.place_bracket(trader=self.trader, position=new_position, coin=self.coin,
+                                                      legs=legs)
+            except Exception as ve:
+                sltp_orders, bracket_error = [], ve
+            if sltp_orders:
+                with tracing.span("db_commit", trader=self.trader_id, position=new_position.id):
+                    SLTPOrder.objects.bulk_create(sltp_orders)
+                transaction.on_commit(trigger_book.touch)
+                tracing.milestone("protected", trader=self.trader_id, position=new_position.id)
+            try:
+                close_fill, open_fill = fills.result()
+            except Exception as ve:
+                fills_error = ve
+
+        if fills_error is None:
+            with transaction.atomic():
+                self.update_position_and_create_position_action(remote_id=remote_id, order_detail=close_fill)
+                new_position.update_position_and_create_position_action(remote_id=remote_id,
+                                                                        order_detail=open_fill)
+        else:
+            # The order did go through: leaving both positions active would block every later signal.
+            logger.error("Reverse recorded without its fills", exc_info=fills_error,
+                         extra={"trader": self.trader_id, "position": self.id, "new_position": new_position.id,
+                                "order": remote_id})
+            new_position.entry_price = entry_price
+            new_position.save(update_fields=["entry_price", "updated"])
+        if sltp_orders:
+            # Only now does the new position have its entry price, which the activation price is based on.
+            TrailingRule.attach(new_position)
+        self.inactivate_all_sltp_orders()
+        self.state = State.Inactive.value
+        self.save(update_fields=['state', 'updated'])
+        error = bracket_error or fills_error
+        if error is not None:
+            raise error
+        return new_position
+
     def expand_position(self, quantity: Decimal):
         side = SideFutures.open_long.value if self.direction == PositionDirection.long.value else \
             SideFutures.open_short.value
@@ -505,9 +672,63 @@ class Position(BaseModel):
         return position_action
 
     def cancel_all_sltp_orders(self):
-        sltp_orders = self.sltporder_set.filter(state=State.Active.value)
-        for sltp_order in sltp_orders:
-            sltp_order.cancel_sltp_order()
+        """Cancel every active SL/TP of the position at once.
+
+        When the position owns all of the trader's plans on the symbol, as listed by
+        the exchange, one cancelSymbolPlan per plan type is enough; otherwise the orders are cancelled
+        concurrently. Local rows are then inactivated in bulk.
+        """
+        sltp_orders = list(self.sltporder_set.filter(state=State.Active.value))
+        if not sltp_orders:
+            return
+        self.trader.check_lease()
+        cache.set_many({sltp_order.id: "pending" for sltp_order in sltp_orders})
+
+        def cancel(sltp_order):
+            try:
+                return self.trader.cancel_sltp(sltporder=sltp_order)
+            except Exception as ve:
+                logger.warning("Could not cancel plan", extra={"position": self.id, "order": sltp_order.remote_id,
+                                                               "error": str(ve)})
+                return False
+
+        def cancel_plan_type(plan_type):
+            try:
+                return self.trader.cancel_symbol_plans(coin=self.coin, plan_type=plan_type)
+            except Exception as ve:
+                logger.warning("Could not cancel symbol plans", extra={"position": self.id, "plan_type": plan_type,
+                                                                       "coin": self.coin, "error": str(ve)})
+                return False
+
+        def owns_all_plans():
+            # cancelSymbolPlan also takes plans we don't track (manual ones, legs of a bracket that failed to
+            # cancel), so the exchange's own list decides, not only our rows.
+            if SLTPOrder.objects.filter(trader_id=self.trader_id, coin=self.coin,
+                                        state=State.Active.value).exclude(position=self).exists():
+                return False
+            try:
+                current_plans = self.trader.get_current_plans(coin=self.coin)
+            except Exception as ve:
+                logger.warning("Could not list current plans", extra={"position": self.id, "error": str(ve)})
+                return False
+            remote_ids = {plan.get("orderId") or plan.get("id") for plan in current_plans}
+            return remote_ids <= {sltp_order.remote_id for sltp_order in sltp_orders}
+
+        canceled = []
+        with ThreadPoolExecutor(max_workers=len(sltp_orders)) as executor:
+            if owns_all_plans():
+                plan_types = {sltp_order.plan_type for sltp_order in sltp_orders}
+                if all(executor.map(cancel_plan_type, plan_types)):
+                    canceled = sltp_orders
+            if not canceled:
+                canceled = [sltp_order for sltp_order, ok in zip(sltp_orders, executor.map(cancel, sltp_orders)) if ok]
+
+        SLTPOrder.inactivate_many([sltp_order.id for sltp_order in canceled])
+        failed = [sltp_order.id for sltp_order in sltp_orders if sltp_order not in canceled]
+        if failed:
+            cache.delete_many(failed)
+        logger.info("Canceled sltp orders", extra={"position": self.id, "canceled": len(canceled),
+                                                   "total": len(sltp_orders)})
 
 
 class PositionAction(BaseModel):
@@ -527,10 +748,98 @@ class PositionAction(BaseModel):
     profit = models.DecimalField(max_digits=10, decimal_places=5)
     fee = models.DecimalField(max_digits=10, decimal_places=5, default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["position", "id"], name="positionaction_position_id_idx"),
+        ]
+
     def __str__(self):
         return f'{self.trader.name} {self.action_side} {self.quantity}'
 
 
+class PnlRollup(BaseModel):
+    trader = models.ForeignKey(Trader, on_delete=models.DO_NOTHING)
+    profit = models.DecimalField(max_digits=14, decimal_places=5, default=0)
+    fee = models.DecimalField(max_digits=14, decimal_places=5, default=0)
+    volume = models.DecimalField(max_digits=18, decimal_places=5, default=0)
+    number_of_fills = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def add(cls, position_action):
+        # Each rollup defines lookup(): the fields that pick its row for the fill.
+        lookup = cls.lookup(position_action)
+        cls.objects.get_or_create(**lookup)
+        cls.objects.filter(**lookup).update(profit=F("profit") + position_action.profit,
+                                            fee=F("fee") + position_action.fee,
+                                            volume=F("volume") + position_action.price * position_action.quantity,
+                                            number_of_fills=F("number_of_fills") + 1,
+                                            updated=timezone.now())
+
+    @staticmethod
+    def record(position_action):
+        """Add one fill to every rollup and to Trader.pnl; call it in the transaction that creates the fill."""
+        TraderDailyPnl.add(position_action)
+        TraderCoinPnl.add(position_action)
+        Trader.objects.filter(id=position_action.trader_id).update(
+            pnl=Coalesce(F("pnl"), Value(Decimal("0"))) + position_action.profit + position_action.fee)
+
+    @staticmethod
+    def rebuild():
+        """Recompute every rollup and Trader.pnl from PositionAction, e.g. after a backfill or a manual fix."""
+        volume = ExpressionWrapper(F("price") * F("quantity"),
+                                   output_field=models.DecimalField(max_digits=18, decimal_places=5))
+        totals = {"profit": Sum("profit"), "fee": Sum("fee"), "volume": Sum(volume), "number_of_fills": Count("id")}
+        with transaction.atomic():
+            TraderDailyPnl.objects.all().delete()
+            TraderCoinPnl.objects.all().delete()
+            TraderDailyPnl.objects.bulk_create(
+                [TraderDailyPnl(**row) for row in PositionAction.objects.annotate(day=TruncDate("created"))
+                 .values("trader_id", "day").annotate(**totals).order_by()], batch_size=2000)
+            TraderCoinPnl.objects.bulk_create(
+                [TraderCoinPnl(**row) for row in PositionAction.objects.values("trader_id", "coin")
+                 .annotate(**totals).order_by()], batch_size=2000)
+            pnl = {row["trader_id"]: row["profit"] + row["fee"]
+                   for row in TraderCoinPnl.objects.values("trader_id").annotate(profit=Sum("profit"), fee=Sum("fee"))}
+            traders = list(Trader.objects.all())
+            for trader in traders:
+                trader.pnl = pnl.get(trader.id, Decimal("0"))
+            Trader.objects.bulk_update(traders, ["pnl"], batch_size=2000)
+
+
+class TraderDailyPnl(PnlRollup):
+    day = models.DateField()
+
+    class Meta:
+        unique_together = (('trader', 'day'),)
+
+    def __str__(self):
+        return f'{self.trader.name} {self.day}'
+
+    @classmethod
+    def lookup(cls, position_action):
+        return {"trader_id": position_action.trader_id, "day": position_action.created.date()}
+
+
+class TraderCoinPnl(PnlRollup):
+    coin = models.CharField(
+        max_length=50,
+        choices=Coin.choices()
+    )
+
+    class Meta:
+        unique_together = (('trader', 'coin'),)
+
+    def __str__(self):
+        return f'{self.trader.name} {self.coin}'
+
+    @classmethod
+    def lookup(cls, position_action):
+        return {"trader_id": position_action.trader_id, "coin": position_action.coin}
+
+
 class SLTPOrder(BaseModel):
     trader = models.ForeignKey(Trader, on_delete=models.DO_NOTHING)
     position = models.ForeignKey(Position, on_delete=models.DO_NOTHING, db_constraint=False)
@@ -547,53 +856,170 @@ class SLTPOrder(BaseModel):
     state = models.IntegerField(choices=State.choices())
     remote_id = models.CharField(max_length=200)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["position", "state", "plan_type", "trigger_price"],
+                         name="sltporder_pos_state_plan_idx"),
+            models.Index(fields=["trader", "coin", "state"], name="sltporder_trdr_coin_state_idx"),
+        ]
+
     def __str__(self):
         return f'{self.coin} {self.plan_type} {self.trader.name}'
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # bulk_create and queryset updates skip this; their callers touch the trigger book themselves.
+        transaction.on_commit(trigger_book.touch)
+
+    @staticmethod
+    def place_bracket(trader: Trader, position: Position, coin: Coin.type, legs):
+        """Place every (plan_type, trigger_price, quantity) leg at once; returns the unsaved orders.
+
+        If any leg is rejected, the TP legs that did get placed are cancelled again and
+        the first error is raised. The SL is kept (placed once more if it was the leg
+        that failed) and saved right away, so the position is never left unprotected;
+        the monitor picks it up like any other active position. A TP that could not be
+        cancelled is saved too, so it is watched and cancelled with the position.
+        """
+        trader.check_lease()
+        with ThreadPoolExecutor(max_workers=len(legs)) as executor:
+            futures = [executor.submit(tracing.bind(trader.place_sltp), coin=coin, plan_type=plan_type,
+                                       trigger_price=trigger_price, direction=position.direction, quantity=quantity)
+                       for plan_type, trigger_price, quantity in legs]
+        sltp_orders, errors = [], []
+        for (plan_type, trigger_price, quantity), future in zip(legs, futures):
+            try:
+                remote_id = future.result()
+            except Exception as ve:
+                errors.append(ve)
+                continue
+            sltp_orders.append(SLTPOrder(trader=trader, position=position, coin=coin, remote_id=remote_id,
+                                         quantity=quantity, plan_type=plan_type, trigger_price=trigger_price,
+                                         state=State.Active.value))
+        if errors:
+            SLTPOrder._keep_stop_loss(trader=trader, position=position, coin=coin, legs=legs,
+                                      placed=sltp_orders)
+            tps = [sltp_order for sltp_order in sltp_orders if sltp_order.plan_type == PlanType.tp.value]
+            with ThreadPoolExecutor(max_workers=len(legs)) as executor:
+                cancels = [executor.submit(trader.cancel_sltp, sltporder=sltp_order) for sltp_order in tps]
+            for sltp_order, cancel in zip(tps, cancels):
+                if cancel.exception() is not None or not cancel.result():
+                    logger.error("Could not cancel leg of rejected bracket",
+                                 extra={"position": position.id, "plan_type": sltp_order.plan_type,
+                                        "order": sltp_order.remote_id})
+                    sltp_order.save()
+            raise errors[0]
+        return sltp_orders
+
     @staticmethod
-    def create_new_sltp_order(trader: Trader, position: Position, coin: Coin.type,
-                              trigger_price: Decimal, quantity: Decimal, plan_type: PlanType.type):
+    def _keep_stop_loss(trader: Trader, position: Position, coin: Coin.type, legs, placed):
+        sl_order = next((sltp_order for sltp_order in placed if sltp_order.plan_type == PlanType.sl.value), None)
+        if sl_order is None:
+            plan_type, trigger_price, quantity = next(leg for leg in legs if leg[0] == PlanType.sl.value)
+            try:
+                remote_id = trader.place_sltp(coin=coin, plan_type=plan_type, trigger_price=trigger_price,
+                                              direction=position.direction, quantity=quantity)
+            except Exception:
+                logger.critical("Position is open WITHOUT a stop loss: bracket rejected and SL retry failed",
+                                exc_info=True, extra={"position": position.id, "trader": trader.id})
+                return None
+            sl_order = SLTPOrder(trader=trader, position=position, coin=coin, remote_id=remote_id,
+                                 quantity=quantity, plan_type=plan_type, trigger_price=trigger_price,
+                                 state=State.Active.value)
+        sl_order.save()
+        logger.critical("Bracket rejected: position is protected by its stop loss only",
+                        extra={"position": position.id, "trader": trader.id, "order": sl_order.remote_id})
+        return sl_order
 
-        remote_id = trader.place_sltp(coin=coin, trigger_price=trigger_price, direction=position.direction,
-                                      quantity=quantity, plan_type=plan_type)
-        sltp_order = SLTPOrder.objects.create(trader=trader, position=position, coin=coin,
-                                              remote_id=remote_id, quantity=quantity, plan_type=plan_type,
-                                              trigger_price=trigger_price, state=State.Active.value)
-        return sltp_order
+    @staticmethod
+    def create_bracket(trader: Trader, position: Position, coin: Coin.type, legs):
+        sltp_orders = SLTPOrder.place_bracket(trader=trader, position=position, coin=coin, legs=legs)
+        with tracing.span("db_commit", trader=trader.id, position=position.id), transaction.atomic():
+            sltp_orders = SLTPOrder.objects.bulk_create(sltp_orders)
+            transaction.on_commit(trigger_book.touch)
+        return sltp_orders
 
     def change_trigger_price(self, new_trigger_price: Decimal):
+        """Move the plan on the exchange; returns what ``Trader.modify_sltp`` did.
+
+        Only a move the exchange made (True) is saved. "Changed" means the plan is no
+        longer modifiable, i.e. it already fired; the monitor applies that fill.
+        """
         changed = self.trader.modify_sltp(sltporder=self, trigger_price=new_trigger_price)
-        if changed:
+        if changed is True:
             self.trigger_price = new_trigger_price
             self.save(update_fields=["trigger_price", "updated"])
-
-    def cancel_sltp_order(self):
-        cache.set(self.id, "pending")
-        canceled = self.trader.cancel_sltp(sltporder=self)
-        if canceled:
-            self.inactivate()
-
-        print(f"NOW the state is {self.state} -> {datetime.now()}")
-
-    def get_information(self):
-        try:
-            present_state = cache.get(self.id)
-            if present_state == "pending" or present_state == "inactivated":
-                return False
-        except Exception as ve:
-            print(ve)
-        self.refresh_from_db()
-        print(f"Getting information for {self.plan_type} with state {self.state} -> {datetime.now()}")
-        if self.state != State.Active.value:
-            return False
-        modified = self.trader.modify_sltp(sltporder=self, trigger_price=self.trigger_price)
-        print(modified)
-        if modified == "Changed":
-            self.inactivate()
-            return True
-        return False
+        return changed
 
     def inactivate(self):
         self.state = State.Inactive.value
         self.save(update_fields=["state", "updated"])
-        cache.set(self.id, "inactivated")
\ No newline at end of file
+        cache.set(self.id, "inactivated")
+
+    @staticmethod
+    def inactivate_many(ids):
+        """Inactivate the still-active orders among ``ids`` and return the ids this call flipped.
+
+        The monitor tick and the order stream may see the same trigger; only the caller
+        that gets an id back should apply it to the position.
+        """
+        if not ids:
+            return set()
+        with transaction.atomic():
+            claimed = set(SLTPOrder.objects.select_for_update().filter(id__in=ids, state=State.Active.value)
+                          .values_list("id", flat=True))
+            SLTPOrder.objects.filter(id__in=claimed).update(state=State.Inactive.value, updated=timezone.now())
+            if claimed:
+                transaction.on_commit(trigger_book.touch)
+        cache.set_many({sltp_order_id: "inactivated" for sltp_order_id in ids})
+        return claimed
+
+
+class TrailingRule(BaseModel):
+    """Keeps the SL of an open position ``distance`` behind the best price seen since ``activation_price``.
+
+    The stop only moves in the position's favour and by at least ``step``; the
+    trailing tick (Logic/trailing.py) evaluates every active rule on each price.
+    """
+    position = models.OneToOneField(Position, on_delete=models.DO_NOTHING, db_constraint=False)
+    distance = models.DecimalField(max_digits=10, decimal_places=1)
+    step = models.DecimalField(max_digits=10, decimal_places=1)
+    activation_price = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    best_price = models.DecimalField(max_digits=10, decimal_places=1, null=True, blank=True)
+    state = models.IntegerField(choices=State.choices(), default=State.Active.value)
+
+    def __str__(self):
+        return f'{self.position} {self.distance}'
+
+    @staticmethod
+    def attach(position: Position):
+        """Trail the SL of ``position`` if TRAILING_STOP_DISTANCE is set; a new bracket starts the trail over."""
+        if not settings.TRAILING_STOP_DISTANCE:
+            return None
+        activation = Decimal(str(settings.TRAILING_STOP_ACTIVATION))
+        if position.direction == PositionDirection.short.value:
+            activation = -activation
+        rule, _ = TrailingRule.objects.update_or_create(
+            position=position,
+            defaults={"distance": Decimal(str(settings.TRAILING_STOP_DISTANCE)),
+                      "step": Decimal(str(settings.TRAILING_STOP_STEP)),
+                      "activation_price": position.entry_price + activation if activation else None,
+                      "best_price": None, "state": State.Active.value})
+        return rule
+
+
+class Signal(BaseModel):
+    idempotency_key = models.CharField(max_length=100)
+    direction = models.CharField(
+        max_length=50,
+        choices=PositionDirection.choices()
+    )
+    status = models.CharField(max_length=20, choices=SignalStatus.choices(), default=SignalStatus.received.value)
+    trace_id = models.CharField(max_length=32, null=True, blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = (('idempotency_key',),)
+
+    def __str__(self):
+        return f'{self.direction} {self.idempotency_key}'
@@ -0,0 +1,280 @@
+import logging
+import time
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Prefetch
+from django_redis import get_redis_connection
+
+from .trader_lock import RELEASE_SCRIPT
+from .trigger_book import TriggerBook
+
+MONITOR_TICK_LOCK_KEY = "sltp_monitor_tick"
+MONITOR_LAST_TICK_KEY = "sltp_monitor_last_tick"
+MONITOR_LAST_SWEEP_KEY = "sltp_monitor_last_sweep"
+MONITOR_RETRY_KEY = "sltp_monitor_retry"
+
+logger = logging.getLogger(__name__)
+
+# Rebuilt from the database only when some process bumped the version (trigger_book.touch).
+_trigger_book = TriggerBook()
+
+
+def acquire_tick_lock(key: str, timeout: int):
+    """Take the lock of a periodic tick; returns the token to release it with, or None if another tick holds it."""
+    token = uuid.uuid4().hex
+    if get_redis_connection("default").set(key, token, nx=True, ex=timeout):
+        return token
+    return None
+
+
+def release_tick_lock(key: str, token: str):
+    # A tick that outlived its timeout must not release the lock the next tick has taken since.
+    get_redis_connection("default").eval(RELEASE_SCRIPT, 1, key, token)
+
+
+def monitored_position_ids():
+    """Every active position; the database is the one record of what needs watching (``Position`` state index)."""
+    from Logic.models import Position, State
+    return list(Position.objects.filter(state=State.Active.value).order_by("id").values_list("id", flat=True))
+
+
+def _plan_id(plan: dict):
+    return plan.get("orderId") or plan.get("id")
+
+
+def load_snapshot(position_ids):
+    """Positions with their active SL/TP orders, in two queries.
+
+    Each position gets ``active_orders`` (sorted by plan type and trigger price);
+    together with the position's own ``entry_price`` that is all ``check_position`` reads.
+    """
+    from Logic.models import Position, SLTPOrder, State
+    active_orders = SLTPOrder.objects.filter(state=State.Active.value).order_by("plan_type", "trigger_price")
+    return list(Position.objects.filter(id__in=position_ids).select_related("trader")
+                .prefetch_related(Prefetch("sltporder_set", queryset=active_orders, to_attr="active_orders")))
+
+
+def sync_plan_orders(trader, coin, active_orders=None):
+    """Reconcile the trader's active SL/TP orders on ``coin`` with the exchange.
+
+    One currentPlan request covers every plan of the trader; historyPlan is only
+    asked about orders that disappeared from it. Orders that were triggered or
+    cancelled remotely are inactivated in bulk. Returns the ids of the triggered ones
+    and of the missing ones historyPlan did not list (yet).
+    ``active_orders`` may be passed in from a snapshot to skip the local read.
+    """
+    from Logic.models import SLTPOrder, State, PlanStatus
+    # Read local rows before the remote list, so an order placed in between can't look "missing".
+    if active_orders is None:
+        active_orders = list(SLTPOrder.objects.filter(trader=trader, coin=coin, state=State.Active.value))
+    if not active_orders:
+        return set(), set()
+    current_ids = {_plan_id(plan) for plan in trader.get_current_plans(coin=coin)}
+    markers = cache.get_many([order.id for order in active_orders])
+    missing = [order for order in active_orders
+               if order.remote_id not in current_ids and markers.get(order.id) not in ("pending", "inactivated")]
+    if not missing:
+        return set(), set()
+
+    recorded = min(order.created for order in missing)
+    start_time = int((recorded.timestamp() - settings.HISTORY_PLAN_LOOKBACK) * 1000)
+    end_time = int(time.time() * 1000)
+    history = {_plan_id(plan): plan.get("status")
+               for plan in trader.get_history_plans(coin=coin, start_time=start_time, end_time=end_time,
+                                                    wanted_ids={order.remote_id for order in missing})}
+    triggered_ids, gone_ids, unresolved_ids = set(), set(), set()
+    for order in missing:
+        status = history.get(order.remote_id)
+        if status == PlanStatus.triggered.value:
+            triggered_ids.add(order.id)
+        elif status is not None and status != PlanStatus.not_triggered.value:
+            gone_ids.add(order.id)
+        else:
+            # Not in the history page yet: look again on the next tick.
+            unresolved_ids.add(order.id)
+    claimed_ids = SLTPOrder.inactivate_many(list(triggered_ids | gone_ids))
+    return triggered_ids & claimed_ids, unresolved_ids
+
+
+def handle_plan_status(trader_id: int, remote_id: str, status: str):
+    """Apply one pushed plan update (see Logic/order_stream.py) the way a monitor tick would."""
+    from Logic.models import SLTPOrder, State, PlanStatus
+    order = SLTPOrder.objects.filter(trader_id=trader_id, remote_id=remote_id, state=State.Active.value).first()
+    if order is None:
+        return
+    if status == PlanStatus.triggered.value:
+        positions = load_snapshot([order.position_id])
+        if order.id not in SLTPOrder.inactivate_many([order.id]) or not positions:
+            return
+        check_position(position=positions[0], triggered_ids={order.id})
+    elif status in (PlanStatus.cancel.value, PlanStatus.fail_triggered.value):
+        if cache.get(order.id) != "pending":
+            SLTPOrder.inactivate_many([order.id])
+
+
+def _move_to_breakeven(sl, breakeven_price: Decimal):
+    try:
+        changed = sl.change_trigger_price(new_trigger_price=breakeven_price)
+    except Exception:
+        # The SL stays where it was, which still protects the position.
+        logger.exception("Could not move SL to breakeven", extra={"position": sl.position_id})
+        return
+    if changed == "Changed":
+        # The SL fired first; the next tick (or the order stream) applies it like any other trigger.
+        logger.info("SL triggered before the breakeven move", extra={"position": sl.position_id})
+    elif changed is not True:
+        logger.warning("Exchange refused SL breakeven move", extra={"position": sl.position_id})
+
+
+def check_position(position, triggered_ids: set):
+    """Apply the SL/TP orders of ``position`` that fired on the exchange.
+
+    ``position`` comes from ``load_snapshot``; only the position row is read again,
+    locked, when the changes are written back in one transaction. Returns True when
+    the position no longer needs monitoring.
+    """
+    from Logic.models import Position, SLTPOrder, State, PlanType, PositionDirection
+    if position.state != State.Active.value:
+        return True
+    logger.debug("Checking position", extra={"position": position.id, "sample": settings.LOG_MONITOR_SAMPLE})
+    sltp_orders = position.active_orders
+    if len(sltp_orders) == 0:
+        return True
+    sls = [order for order in sltp_orders if order.plan_type == PlanType.sl.value]
+    assert len(sls) == 1
+    sl = sls[0]
+
+    filled, closing_order, breakeven_price = [], None, None
+    if sl.id in triggered_ids:
+        filled, closing_order = [sl], sl
+    else:
+        tps = [order for order in sltp_orders if order.plan_type == PlanType.tp.value]
+        if position.direction == PositionDirection.long.value:
+            sorted_tps = sorted(tps, key=lambda order: order.trigger_price)
+            breakeven_ratio = Decimal("0.995")
+        elif position.direction == PositionDirection.short.value:
+            sorted_tps = sorted(tps, key=lambda order: order.trigger_price, reverse=True)
+            breakeven_ratio = Decimal("1.005")
+        else:
+            raise Exception(f"Unknown direction {position.direction} for {position.id}")
+
+        number_of_tps = len(sorted_tps)
+        assert number_of_tps <= 2
+        if number_of_tps == 0:
+            # Only the SL survived a rejected bracket (SLTPOrder.place_bracket); nothing else can fire.
+            return False
+        filled = [tp for tp in sorted_tps if tp.id in triggered_ids]
+        # A lone TP left over from a rejected bracket may cover only part of the position.
+        if sorted_tps[-1] in filled and (number_of_tps == 2 or sorted_tps[-1].quantity >= position.quantity):
+            closing_order = sorted_tps[-1]
+        elif number_of_tps == 2 and sorted_tps[0] in filled:
+            breakeven_price = position.entry_price * breakeven_ratio
+            # Only ever tighten: a trailing stop may already sit past breakeven.
+            tightens = breakeven_price > sl.trigger_price if position.direction == PositionDirection.long.value \
+                else breakeven_price < sl.trigger_price
+            if not tightens:
+                breakeven_price = None
+
+    if not filled:
+        return False
+
+    update_fields = ["quantity", "updated"]
+    with transaction.atomic():
+        # The order stream and the tick can claim different legs of one position at once; lock the row so
+        # each applies its decrement to the other's result, not to the snapshot.
+        locked = Position.objects.select_for_update().get(id=position.id)
+        if locked.state != State.Active.value:
+            return True
+        locked.quantity -= sum(order.quantity for order in filled)
+        if closing_order is not None:
+            SLTPOrder.inactivate_many([order.id for order in sltp_orders if order.id not in triggered_ids])
+            locked.state = State.Inactive.value
+            update_fields.append("state")
+        locked.save(update_fields=update_fields)
+        if breakeven_price is not None:
+            # An exchange call can't be rolled back: move the SL only once the fill is on record.
+            transaction.on_commit(lambda: _move_to_breakeven(sl, breakeven_price))
+    position.quantity, position.state = locked.quantity, locked.state
+    return closing_order is not None
+
+
+def candidate_position_ids(since: float):
+    """Positions whose SL/TP triggers the price reached (or came near) since ``since``, or None for all of them.
+
+    None is returned when there was no previous tick or a full sweep is due, and per
+    coin all of its positions are kept when the price feed can't tell where the price
+    has been.
+    """
+    from .price_feed import get_price_range
+    now = time.time()
+    if since is None or now - (cache.get(MONITOR_LAST_SWEEP_KEY) or 0) >= settings.SLTP_MONITOR_FULL_SWEEP_INTERVAL:
+        cache.set(MONITOR_LAST_SWEEP_KEY, now, timeout=None)
+        return None
+    _trigger_book.refresh()
+    position_ids = set()
+    for coin in _trigger_book.coins():
+        price_range = get_price_range(coin, since=since, max_gap=settings.PRICE_FEED_MAX_STALENESS)
+        if price_range is None:
+            position_ids.update(_trigger_book.reached(coin, low=0.0, high=float("inf")))
+            continue
+        low, high = price_range
+        position_ids.update(_trigger_book.reached(coin, low=float(low), high=float(high),
+                                                  band=settings.SLTP_TRIGGER_BAND))
+    return position_ids
+
+
+def run_tick():
+    """Check the active positions once; one tick runs at a time across all workers.
+
+    Exchange calls per tick grow with the number of (trader, coin) pairs whose
+    triggers the price came near, not with the number of SL/TP orders. Positions
+    a tick probed but could not resolve are probed again by the next one, whatever
+    the price did in between.
+    """
+    token = acquire_tick_lock(MONITOR_TICK_LOCK_KEY, timeout=settings.SLTP_MONITOR_LOCK_TIMEOUT)
+    if token is None:
+        logger.info("Previous SL/TP monitor tick is still running", extra={"sample": settings.LOG_MONITOR_SAMPLE})
+        return
+    try:
+        started = time.time()
+        candidates = candidate_position_ids(since=cache.get(MONITOR_LAST_TICK_KEY))
+        position_ids = monitored_position_ids()
+        if candidates is not None:
+            candidates |= set(cache.get(MONITOR_RETRY_KEY) or ())
+            skipped = len(position_ids)
+            position_ids = [position_id for position_id in position_ids if position_id in candidates]
+            skipped -= len(position_ids)
+            logger.debug("Positions skipped by the trigger book", extra={"skipped": skipped,
+                                                                         "sample": settings.LOG_MONITOR_SAMPLE})
+        positions = {position.id: position for position in load_snapshot(position_ids)}
+
+        groups = {}
+        for position in positions.values():
+            groups.setdefault((position.trader_id, position.coin), []).append(position)
+
+        unresolved = set()
+        for group in groups.values():
+            trader, coin = group[0].trader, group[0].coin
+            active_orders = [order for position in group for order in position.active_orders]
+            try:
+                triggered_ids, unresolved_ids = sync_plan_orders(trader=trader, coin=coin,
+                                                                 active_orders=active_orders)
+            except Exception:
+                logger.exception("Could not sync plan orders", extra={"trader": trader.id, "coin": coin})
+                unresolved.update(position.id for position in group)
+                continue
+            unresolved.update(order.position_id for order in active_orders if order.id in unresolved_ids)
+            for position in group:
+                try:
+                    check_position(position=position, triggered_ids=triggered_ids)
+                except Exception:
+                    logger.exception("Could not check position", extra={"position": position.id})
+                    unresolved.add(position.id)
+        # Only a tick that got this far moves the window; one that died early is covered by the next.
+        cache.set_many({MONITOR_LAST_TICK_KEY: started, MONITOR_RETRY_KEY: unresolved}, timeout=None)
+    finally:
+        release_tick_lock(MONITOR_TICK_LOCK_KEY, token)
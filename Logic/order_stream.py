@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+import time
+
+import websockets
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+PLAN_CHANNEL = "ordersAlgo"
+
+logger = logging.getLogger(__name__)
+
+
+def login_message(trader):
+    timestamp = str(int(time.time()))
+    signature = trader.signer.sign((timestamp + "GET" + "/user/verify").encode())
+    return {"op": "login", "args": [{"apiKey": trader.api_key,
+                                     "passphrase": trader.api_passphrase,
+                                     "timestamp": timestamp,
+                                     "sign": signature.decode()}]}
+
+
+def subscribe_message():
+    return {"op": "subscribe", "args": [{"instType": "UMCBL", "channel": PLAN_CHANNEL, "instId": "default"}]}
+
+
+def plan_updates(message: dict):
+    """Yield (remote_id, status) for every plan order in a pushed ordersAlgo message."""
+    if message.get("arg", {}).get("channel") != PLAN_CHANNEL:
+        return
+    for plan in message.get("data") or []:
+        remote_id = plan.get("orderId") or plan.get("id")
+        if remote_id is not None:
+            yield str(remote_id), plan.get("status")
+
+
+class OrderStream:
+    """Private order/plan event consumer with one WebSocket connection per trader.
+
+    Triggered SL/TP plans are applied through ``Logic.monitor.handle_plan_status``,
+    so the position bookkeeping stays identical to the polling monitor.
+    """
+
+    def __init__(self, url: str = None):
+        self.url = url or settings.COINCATCH_WS_URL
+        self.connections = {}
+
+    async def _handle_message(self, trader_id: int, raw: str):
+        from Logic.monitor import handle_plan_status
+        if raw == "pong":
+            return
+        message = json.loads(raw)
+        if message.get("event") == "error":
+            raise Exception(f"Order stream error for trader {trader_id}: {message}")
+        for remote_id, status in plan_updates(message):
+            await sync_to_async(handle_plan_status)(trader_id=trader_id, remote_id=remote_id, status=status)
+
+    async def _keepalive(self, websocket):
+        while True:
+            await asyncio.sleep(settings.COINCATCH_WS_PING_INTERVAL)
+            await websocket.send("ping")
+
+    async def consume(self, trader):
+        while True:
+            try:
+                async with websockets.connect(self.url, ping_interval=None) as websocket:
+                    await websocket.send(json.dumps(login_message(trader)))
+                    await websocket.send(json.dumps(subscribe_message()))
+                    keepalive = asyncio.create_task(self._keepalive(websocket))
+                    try:
+                        async for raw in websocket:
+                            await self._handle_message(trader.id, raw)
+                    finally:
+                        keepalive.cancel()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Order stream disconnected", extra={"trader": trader.id})
+            await asyncio.sleep(settings.COINCATCH_WS_RECONNECT_DELAY)
+
+    async def run(self):
+        from Logic.models import Trader
+        while True:
+            traders = await sync_to_async(list)(Trader.objects.all())
+            for trader in traders:
+                if trader.id not in self.connections:
+                    self.connections[trader.id] = asyncio.create_task(self.consume(trader))
+            await asyncio.sleep(settings.COINCATCH_WS_TRADER_REFRESH)
+
+
+class FakeOrderStream:
+    """Local stand-in for the exchange's private stream, for tests.
+
+    Accepts any login/subscribe and lets the test push plan status changes to every
+    connected client with ``push_plan``.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.clients = set()
+        self.server = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    async def _handler(self, websocket):
+        self.clients.add(websocket)
+        try:
+            async for raw in websocket:
+                if raw == "ping":
+                    await websocket.send("pong")
+                    continue
+                message = json.loads(raw)
+                if message.get("op") == "login":
+                    await websocket.send(json.dumps({"event": "login", "code": 0}))
+                elif message.get("op") == "subscribe":
+                    for arg in message.get("args", []):
+                        await websocket.send(json.dumps({"event": "subscribe", "arg": arg}))
+        except websockets.ConnectionClosed:
+            # A consumer going away mid-test is not an error of the fake.
+            pass
+        finally:
+            self.clients.discard(websocket)
+
+    async def start(self):
+        self.server = await websockets.serve(self._handler, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self
+
+    async def push_plan(self, remote_id: str, status: str, symbol: str = "BTCUSDT_UMCBL"):
+        message = {"action": "snapshot",
+                   "arg": {"instType": "UMCBL", "channel": PLAN_CHANNEL, "instId": "default"},
+                   "data": [{"id": remote_id, "instId": symbol, "status": status}]}
+        websockets.broadcast(self.clients, json.dumps(message))
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
@@ -0,0 +1,73 @@
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from .client import get_client
+from .utils import interpret_response
+
+
+def _price_key(coin: str):
+    return f"mark_price:{coin}"
+
+
+def _history_key(coin: str):
+    return f"mark_price_history:{coin}"
+
+
+def publish_price(coin: str, price: Decimal, timestamp: float = None):
+    entry = {"price": str(price), "ts": time.time() if timestamp is None else timestamp}
+    cache.set(_price_key(coin), entry, timeout=settings.PRICE_FEED_TTL)
+    # Every sample also goes into a short sorted history, so the SL/TP monitor sees the range between its ticks.
+    pipeline = get_redis_connection("default").pipeline()
+    pipeline.zadd(_history_key(coin), {f"{entry['ts']}:{entry['price']}": entry["ts"]})
+    pipeline.zremrangebyscore(_history_key(coin), "-inf", entry["ts"] - settings.PRICE_HISTORY_SECONDS)
+    pipeline.expire(_history_key(coin), settings.PRICE_HISTORY_SECONDS)
+    pipeline.execute()
+
+
+def get_cached_price(coin: str, max_staleness: float):
+    """Latest published price of ``coin``, or None when it is older than ``max_staleness`` seconds."""
+    entry = cache.get(_price_key(coin))
+    if entry is None:
+        return None
+    if time.time() - entry["ts"] > max_staleness:
+        return None
+    return Decimal(entry["price"])
+
+
+def get_price_range(coin: str, since: float, max_gap: float):
+    """Lowest and highest price of ``coin`` from ``since`` until now, or None when the feed can't vouch for it.
+
+    That is when the history doesn't reach back to ``since``, or any two samples
+    (or the last one and now) are more than ``max_gap`` seconds apart: the price
+    may have been anywhere in between.
+    """
+    now = time.time()
+    samples = get_redis_connection("default").zrangebyscore(_history_key(coin), since - max_gap, "+inf",
+                                                            withscores=True)
+    if not samples or samples[0][1] > since:
+        return None
+    timestamps = [timestamp for member, timestamp in samples] + [now]
+    if any(later - earlier > max_gap for earlier, later in zip(timestamps, timestamps[1:])):
+        return None
+    prices = [Decimal(member.decode().split(":", 1)[1]) for member, timestamp in samples]
+    return min(prices), max(prices)
+
+
+def fetch_mark_price(coin: str):
+    # mark-price is a public market endpoint, so the feed doesn't need any trader's keys.
+    response = get_client().get(request_path="/api/mix/v1/market/mark-price",
+                                headers={'Content-Type': 'application/json', 'locale': 'en-US'},
+                                query_string=f'symbol={coin}')
+    if response.status_code != 200:
+        raise Exception("Error in get price!")
+    return Decimal(interpret_response(dictionary=response.json(), key="markPrice"))
+
+
+def refresh_price(coin: str):
+    price = fetch_mark_price(coin)
+    publish_price(coin, price)
+    return price
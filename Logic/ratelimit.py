@@ -0,0 +1,98 @@
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .exceptions import RateLimited
+
+METRICS_KEY = "ratelimit:metrics"
+PUBLIC_KEY = "public"
+
+# Token bucket on the Redis clock, so every worker in the cluster refills the same way.
+# A caller may take a token that is not there yet (the bucket goes negative) and is told
+# how long to wait for it; that paces bursts instead of rejecting them. Returns -1 when
+# the wait would exceed max_wait_ms, without taking anything.
+TOKEN_BUCKET_SCRIPT = """
+redis.replicate_commands()
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local max_wait_ms = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + (now - ts) * rate / 1000)
+local wait_ms = 0
+if tokens < 1 then
+    wait_ms = math.ceil((1 - tokens) * 1000 / rate)
+end
+if wait_ms > max_wait_ms then
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+    return -1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens - 1), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity * 1000 / rate) + 1000)
+return wait_ms
+"""
+
+
+def endpoint_class(request_path: str):
+    if "/plan/" in request_path:
+        return "plan"
+    elif "/order/" in request_path:
+        return "order"
+    elif "/market/" in request_path:
+        return "market"
+    return "account"
+
+
+class RateLimiter:
+    """Cluster-wide token buckets per (API key, endpoint class), see EXCHANGE_RATE_LIMITS."""
+
+    def __init__(self, limits: dict, max_wait: float):
+        self.limits = limits
+        self.max_wait_ms = int(max_wait * 1000)
+        self._script = None
+
+    @classmethod
+    def from_settings(cls):
+        return cls(limits=settings.EXCHANGE_RATE_LIMITS, max_wait=settings.EXCHANGE_RATE_LIMIT_MAX_WAIT)
+
+    @property
+    def script(self):
+        if self._script is None:
+            self._script = get_redis_connection("default").register_script(TOKEN_BUCKET_SCRIPT)
+        return self._script
+
+    def acquire(self, api_key: str, request_path: str):
+        group = endpoint_class(request_path)
+        if group not in self.limits:
+            return
+        rate, capacity = self.limits[group]
+        wait_ms = self.script(keys=[f"ratelimit:{group}:{api_key}"], args=[rate, capacity, self.max_wait_ms])
+        if wait_ms < 0:
+            record(group, "denials")
+            raise RateLimited(message=f"No {group} request budget left for {api_key}")
+        if wait_ms > 0:
+            record(group, "waits", wait_ms=wait_ms)
+            time.sleep(wait_ms / 1000)
+        else:
+            record(group, "immediate")
+
+
+def record(group: str, event: str, wait_ms: int = 0):
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    pipeline.hincrby(METRICS_KEY, f"{group}:{event}", 1)
+    if wait_ms:
+        pipeline.hincrby(METRICS_KEY, f"{group}:wait_ms", wait_ms)
+    pipeline.execute()
+
+
+def metrics():
+    """Counters per endpoint class: immediate, waits, wait_ms, denials and rejections (HTTP 429 from the exchange)."""
+    output = {}
+    for field, value in get_redis_connection("default").hgetall(METRICS_KEY).items():
+        group, event = field.decode().split(":", 1)
+        output.setdefault(group, {})[event] = int(value)
+    return output
@@ -0,0 +1,148 @@
+import logging
+import socket
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+SIGNAL_STREAM_KEY = "signals"
+SIGNAL_GROUP = "executors"
+
+
+def publish(signal, trace: dict):
+    """Append an accepted webhook signal to the stream the consumers execute from."""
+    return get_redis_connection("default").xadd(
+        SIGNAL_STREAM_KEY,
+        {"signal": signal.id, "direction": signal.direction, "trace": trace["id"],
+         "received_at": repr(trace["received_at"])},
+        maxlen=settings.SIGNAL_STREAM_MAXLEN, approximate=True)
+
+
+class SignalConsumer:
+    """Reads signals from the stream as part of a consumer group and executes them.
+
+    Entries that arrived within SIGNAL_COALESCE_MS of the newest one in their burst
+    are handled together: only that newest signal runs, the others are marked
+    superseded. Bursts further apart run one after another.
+    Entries are acknowledged after they ran, so a consumer that dies mid-signal
+    leaves them pending and picks them up again on restart, unless by then they are
+    older than SIGNAL_MAX_AGE.
+    """
+
+    def __init__(self, name: str = None, block_ms: int = 5000, count: int = 100):
+        # A stable name lets a restarted consumer find the entries it had not acknowledged yet.
+        self.name = name or socket.gethostname()
+        self.block_ms = block_ms
+        self.count = count
+        self.redis = get_redis_connection("default")
+
+    def ensure_group(self):
+        try:
+            # From the start of the stream: signals sent before the first consumer came up still run, and
+            # expire() drops the ones that went stale.
+            self.redis.xgroup_create(SIGNAL_STREAM_KEY, SIGNAL_GROUP, id="0", mkstream=True)
+        except ResponseError as ve:
+            if "BUSYGROUP" not in str(ve):
+                raise
+
+    def _read(self, stream_id: str, block: int = None):
+        response = self.redis.xreadgroup(SIGNAL_GROUP, self.name, {SIGNAL_STREAM_KEY: stream_id},
+                                         count=self.count, block=block)
+        return [entry for stream, entries in response or [] for entry in entries]
+
+    def _decode(self, entry):
+        stream_id, fields = entry
+        fields = {key.decode(): value.decode() for key, value in fields.items()}
+        return stream_id, fields
+
+    def _bursts(self, entries):
+        """Split decoded entries into runs whose signals arrived within SIGNAL_COALESCE_MS of the run's newest one."""
+        window = settings.SIGNAL_COALESCE_MS / 1000
+        bursts, newest = [], None
+        for stream_id, fields in reversed(entries):
+            received_at = float(fields["received_at"])
+            if not window or newest is None or newest - received_at > window:
+                bursts.append([])
+                newest = received_at
+            bursts[-1].append((stream_id, fields))
+        return [burst[::-1] for burst in reversed(bursts)]
+
+    def handle(self, entries):
+        """Run the newest signal of every burst among ``entries``, oldest burst first."""
+        entries = [self._decode(entry) for entry in entries]
+        for burst in self._bursts(entries):
+            self._run_burst(burst)
+
+    def _run_burst(self, entries):
+        from Logic.engine import execute_signal
+        from Logic.models import Signal, SignalStatus
+        *superseded, (stream_id, latest) = entries
+        if superseded:
+            Signal.objects.filter(id__in=[int(fields["signal"]) for _, fields in superseded]) \
+                .update(status=SignalStatus.superseded.value, processed_at=timezone.now(), updated=timezone.now())
+            logger.info("Signals superseded within the coalescing window",
+                        extra={"signals": [fields["signal"] for _, fields in superseded], "kept": latest["signal"]})
+
+        trace = {"id": latest["trace"], "received_at": float(latest["received_at"])}
+        status = SignalStatus.executed.value
+        with tracing.use_trace(trace):
+            tracing.milestone("task_start", direction=latest["direction"], signal=latest["signal"])
+            try:
+                results = execute_signal(direction=latest["direction"])
+                if results and not any(result["ok"] for result in results):
+                    status = SignalStatus.failed.value
+            except Exception:
+                logger.exception("Signal failed", extra={"signal": latest["signal"]})
+                status = SignalStatus.failed.value
+        Signal.objects.filter(id=int(latest["signal"])).update(status=status, processed_at=timezone.now(),
+                                                                updated=timezone.now())
+        self.redis.xack(SIGNAL_STREAM_KEY, SIGNAL_GROUP, *[stream_id for stream_id, _ in entries])
+
+    def expire(self, entries):
+        """Acknowledge the entries older than SIGNAL_MAX_AGE as expired and return the others.
+
+        After a restart the pending entries, or the backlog a new group starts with,
+        may be minutes old; trading on them would act on a market that has moved on.
+        """
+        from Logic.models import Signal, SignalStatus
+        cutoff = time.time() - settings.SIGNAL_MAX_AGE
+        expired, fresh = [], []
+        for entry in entries:
+            stream_id, fields = self._decode(entry)
+            if float(fields["received_at"]) < cutoff:
+                expired.append((stream_id, fields))
+            else:
+                fresh.append(entry)
+        if expired:
+            Signal.objects.filter(id__in=[int(fields["signal"]) for _, fields in expired]) \
+                .update(status=SignalStatus.expired.value, processed_at=timezone.now(), updated=timezone.now())
+            self.redis.xack(SIGNAL_STREAM_KEY, SIGNAL_GROUP, *[stream_id for stream_id, _ in expired])
+            logger.warning("Pending signals expired", extra={"signals": [fields["signal"] for _, fields in expired]})
+        return fresh
+
+    def poll(self):
+        entries = self._read(">", block=self.block_ms)
+        if entries and settings.SIGNAL_COALESCE_MS:
+            time.sleep(settings.SIGNAL_COALESCE_MS / 1000)
+            entries += self._read(">")
+        close_old_connections()
+        self.handle(self.expire(entries))
+
+    def run(self):
+        self.ensure_group()
+        # Whatever this consumer read but never acknowledged before a restart comes first, unless it went stale.
+        while pending := self._read("0"):
+            self.handle(self.expire(pending))
+        while True:
+            try:
+                self.poll()
+            except Exception:
+                logger.exception("Signal consumer error")
+                time.sleep(1)
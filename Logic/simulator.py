@@ -0,0 +1,372 @@
+import itertools
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+SUCCESS = "00000"
+CLOSE_SIDES = {"close_long": "long", "close_short": "short"}
+OPEN_SIDES = {"open_long": "long", "open_short": "short"}
+
+
+def _ms():
+    return int(time.time() * 1000)
+
+
+class SimulatedExchange:
+    """In-memory CoinCatch mix API: market orders, TP/SL plans and a moving mark price.
+
+    Plans are matched against the price on every tick: a long ``profit_plan``
+    fires at or above its trigger, a long ``loss_plan`` at or below (mirrored for
+    shorts), and the fill closes that much of the position at the tick price.
+    Keys are not verified; ``ACCESS-KEY`` only separates the traders' books.
+    """
+
+    def __init__(self, price: float = 60000.0, volatility: float = 0.0005, fee_rate: float = 0.0006,
+                 slippage: float = 0.0001, path: list = None, seed: int = None):
+        self.price = price
+        self.volatility = volatility
+        self.fee_rate = fee_rate
+        self.slippage = slippage
+        self.path = itertools.cycle(path) if path else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(10 ** 17)
+        self.plans = {}
+        self.orders = {}
+        self.positions = defaultdict(lambda: {"size": 0.0, "cost": 0.0})
+
+    def _next_id(self):
+        return str(next(self.ids))
+
+    # price path
+
+    def tick(self):
+        with self.lock:
+            if self.path is not None:
+                self.price = float(next(self.path))
+            else:
+                self.price *= math.exp(self.random.gauss(0, self.volatility))
+            self._match_plans()
+            return self.price
+
+    def set_price(self, price: float):
+        with self.lock:
+            self.price = price
+            self._match_plans()
+
+    def _match_plans(self):
+        for plan in list(self.plans.values()):
+            if plan["status"] != "not_trigger":
+                continue
+            long = plan["holdSide"] == "long"
+            above = plan["planType"] == "profit_plan" if long else plan["planType"] == "loss_plan"
+            trigger = float(plan["triggerPrice"])
+            if (self.price >= trigger) if above else (self.price <= trigger):
+                self._trigger(plan)
+
+    def _trigger(self, plan):
+        book = self.positions[(plan["key"], plan["symbol"], plan["holdSide"])]
+        size = min(float(plan["size"]), book["size"])
+        plan["status"] = "triggered"
+        plan["uTime"] = _ms()
+        if size <= 0:
+            return
+        order_id = self._next_id()
+        side = "close_" + plan["holdSide"]
+        self.orders[order_id] = {"key": plan["key"], "symbol": plan["symbol"], "side": side, "size": size,
+                                 "cTime": _ms(), "fills": [self._fill(plan["key"], plan["symbol"], side, size,
+                                                                      self.price, order_id)]}
+        plan["executeOrderId"] = order_id
+        if self.positions[(plan["key"], plan["symbol"], plan["holdSide"])]["size"] <= 0:
+            # The exchange drops a position's remaining TP/SL once it is flat.
+            for other in self.plans.values():
+                if (other["key"], other["symbol"], other["holdSide"]) == (plan["key"], plan["symbol"],
+                                                                         plan["holdSide"]) \
+                        and other["status"] == "not_trigger":
+                    other["status"] = "cancel"
+                    other["uTime"] = _ms()
+
+    def _fill(self, key, symbol, side, size, price, order_id):
+        hold_side = CLOSE_SIDES.get(side) or OPEN_SIDES[side]
+        book = self.positions[(key, symbol, hold_side)]
+        profit = 0.0
+        if side in CLOSE_SIDES:
+            size = min(size, book["size"])
+            average = book["cost"] / book["size"] if book["size"] else price
+            profit = (price - average) * size * (1 if hold_side == "long" else -1)
+            book["cost"] -= average * size
+            book["size"] -= size
+        else:
+            book["cost"] += price * size
+            book["size"] += size
+        fee = -abs(price * size * self.fee_rate)
+        return {"tradeId": self._next_id(), "symbol": symbol, "orderId": order_id, "price": f"{price:.1f}",
+                "sizeQty": f"{size:.3f}", "fee": f"{fee:.8f}", "side": side, "fillAmount": f"{price * size:.4f}",
+                "profit": f"{profit:.8f}", "cTime": str(_ms())}
+
+    # REST handlers, each returning (http status, code, msg, data)
+
+    def place_order(self, key, body):
+        side, symbol, size = body["side"], body["symbol"], float(body["size"])
+        with self.lock:
+            direction = 1 if side in ("open_long", "close_short") else -1
+            price = round(self.price * (1 + direction * self.slippage), 1)
+            order_id = self._next_id()
+            fills = [self._fill(key, symbol, side, size, price, order_id)]
+            if body.get("reverse") and side in CLOSE_SIDES:
+                open_side = "open_short" if side == "close_long" else "open_long"
+                fills.append(self._fill(key, symbol, open_side, size, price, order_id))
+            self.orders[order_id] = {"key": key, "symbol": symbol, "side": side, "size": size, "cTime": _ms(),
+                                     "fills": fills}
+        return 200, SUCCESS, "success", {"clientOid": None, "orderId": order_id}
+
+    def place_tpsl(self, key, body):
+        with self.lock:
+            order_id = self._next_id()
+            self.plans[order_id] = {"orderId": order_id, "key": key, "symbol": body["symbol"],
+                                    "marginCoin": body.get("marginCoin", "USDT"), "size": body["size"],
+                                    "planType": body["planType"], "triggerPrice": body["triggerPrice"],
+                                    "holdSide": body["holdSide"], "side": "close_" + body["holdSide"],
+                                    "status": "not_trigger", "orderType": "market", "triggerType": "fill_price",
+                                    "executePrice": "0", "cTime": _ms(), "uTime": _ms()}
+        return 200, SUCCESS, "success", {"clientOid": None, "orderId": order_id}
+
+    def modify_tpsl(self, key, body):
+        with self.lock:
+            plan = self.plans.get(str(body["orderId"]))
+            if plan is None or plan["key"] != key:
+                return 400, "40768", "Order does not exist", None
+            if plan["status"] != "not_trigger":
+                return 400, "43020", "The plan order status is not allowed to modify", None
+            plan["triggerPrice"] = body["triggerPrice"]
+            plan["uTime"] = _ms()
+            self._match_plans()
+        return 200, SUCCESS, "success", {"clientOid": None, "orderId": plan["orderId"]}
+
+    def cancel_plan(self, key, body):
+        with self.lock:
+            plan = self.plans.get(str(body["orderId"]))
+            if plan is None or plan["key"] != key:
+                return 400, "40768", "Order does not exist", None
+            if plan["status"] != "not_trigger":
+                return 400, "43025", "Plan order does not exist", None
+            plan["status"] = "cancel"
+            plan["uTime"] = _ms()
+        return 200, SUCCESS, "success", {"clientOid": None, "orderId": plan["orderId"]}
+
+    def cancel_symbol_plan(self, key, body):
+        with self.lock:
+            for plan in self.plans.values():
+                if plan["key"] == key and plan["symbol"] == body["symbol"] \
+                        and plan["planType"] == body.get("planType", plan["planType"]) \
+                        and plan["status"] == "not_trigger":
+                    plan["status"] = "cancel"
+                    plan["uTime"] = _ms()
+        return 200, SUCCESS, "success", True
+
+    def _public_plan(self, plan):
+        return {name: (str(value) if name in ("cTime", "uTime") else value)
+                for name, value in plan.items() if name != "key"}
+
+    def current_plans(self, key, query):
+        with self.lock:
+            return 200, SUCCESS, "success", [self._public_plan(plan) for plan in self.plans.values()
+                                             if plan["key"] == key and plan["symbol"] == query.get("symbol")
+                                             and plan["status"] == "not_trigger"]
+
+    def history_plans(self, key, query):
+        start, end = int(query.get("startTime", 0)), int(query.get("endTime", _ms()))
+        page_size = int(query.get("pageSize", 100))
+        with self.lock:
+            plans = [self._public_plan(plan) for plan in self.plans.values()
+                     if plan["key"] == key and plan["symbol"] == query.get("symbol")
+                     and start <= plan["cTime"] <= end]
+        plans.sort(key=lambda plan: (int(plan["cTime"]), plan["orderId"]), reverse=True)
+        if query.get("lastEndId"):
+            ids = [plan["orderId"] for plan in plans]
+            last_end = query["lastEndId"]
+            plans = plans[ids.index(last_end) + 1:] if last_end in ids else []
+        return 200, SUCCESS, "success", plans[:page_size]
+
+    def mark_price(self, key, query):
+        with self.lock:
+            return 200, SUCCESS, "success", {"symbol": query.get("symbol"), "markPrice": f"{self.price:.1f}",
+                                             "timestamp": str(_ms())}
+
+    def order_fills(self, key, query):
+        with self.lock:
+            order = self.orders.get(query.get("orderId"))
+            if order is None or order["key"] != key:
+                return 200, SUCCESS, "success", []
+            return 200, SUCCESS, "success", list(order["fills"])
+
+    def order_detail(self, key, query):
+        with self.lock:
+            order = self.orders.get(query.get("orderId"))
+            if order is None:
+                plan = self.plans.get(query.get("orderId"))
+                order = self.orders.get(plan.get("executeOrderId")) if plan is not None else None
+            if order is None or order["key"] != key:
+                return 400, "40768", "Order does not exist", None
+            fills = order["fills"]
+            filled = sum(float(fill["sizeQty"]) for fill in fills)
+            average = sum(float(fill["price"]) * float(fill["sizeQty"]) for fill in fills) / filled if filled else 0
+            return 200, SUCCESS, "success", {
+                "symbol": order["symbol"], "size": order["size"], "orderId": fills[0]["orderId"] if fills else None,
+                "filledQty": filled, "fee": sum(float(fill["fee"]) for fill in fills),
+                "totalProfits": sum(float(fill["profit"]) for fill in fills), "state": "filled",
+                "side": order["side"], "orderType": "market", "priceAvg": average, "cTime": str(order["cTime"])}
+
+
+ROUTES = {
+    ("POST", "/api/mix/v1/order/placeOrder"): "place_order",
+    ("POST", "/api/mix/v1/plan/placeTPSL"): "place_tpsl",
+    ("POST", "/api/mix/v1/plan/modifyTPSLPlan"): "modify_tpsl",
+    ("POST", "/api/mix/v1/plan/cancelPlan"): "cancel_plan",
+    ("POST", "/api/mix/v1/plan/cancelSymbolPlan"): "cancel_symbol_plan",
+    ("GET", "/api/mix/v1/plan/currentPlan"): "current_plans",
+    ("GET", "/api/mix/v1/plan/historyPlan"): "history_plans",
+    ("GET", "/api/mix/v1/market/mark-price"): "mark_price",
+    ("GET", "/api/mix/v1/order/fills"): "order_fills",
+    ("GET", "/api/mix/v1/order/detail"): "order_detail",
+}
+PUBLIC_ROUTES = {"mark_price"}
+
+
+class Faults:
+    """Latency, error and rate-limit injection applied in front of every route."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 error_code: str = "43020", rate_limit: int = 0, rate_limit_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.rate_limit = rate_limit
+        self.rate_limit_rate = rate_limit_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.windows = defaultdict(deque)
+
+    def delay(self):
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+    def rate_limited(self, key: str, path: str):
+        with self.lock:
+            if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+                return True
+            if not self.rate_limit:
+                return False
+            # Per key and path, at most rate_limit requests in any one-second window.
+            window, now = self.windows[(key, path)], time.monotonic()
+            while window and now - window[0] >= 1:
+                window.popleft()
+            if len(window) >= self.rate_limit:
+                return True
+            window.append(now)
+            return False
+
+    def failed(self, method: str):
+        with self.lock:
+            return method == "POST" and self.error_rate and self.random.random() < self.error_rate
+
+
+def make_handler(exchange: SimulatedExchange, faults: Faults):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body go out in separate writes; with Nagle on, a keep-alive client waits ~40 ms for the body.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, http_status, code, msg, data=None):
+            payload = json.dumps({"code": code, "msg": msg, "requestTime": _ms(), "data": data}).encode()
+            self.send_response(http_status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _control(self, method, path, body):
+            if method == "POST" and path == "/sim/price":
+                exchange.set_price(float(body["price"]))
+            with exchange.lock:
+                state = {"price": exchange.price, "plans": len(exchange.plans), "orders": len(exchange.orders),
+                         "open_plans": sum(plan["status"] == "not_trigger" for plan in exchange.plans.values())}
+            return self._reply(200, SUCCESS, "success", state)
+
+        def _dispatch(self, method):
+            url = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            body = json.loads(raw) if raw else {}
+            if url.path.startswith("/sim/"):
+                return self._control(method, url.path, body)
+            route = ROUTES.get((method, url.path))
+            if route is None:
+                return self._reply(404, "40404", "Request URL NOT FOUND")
+            key = self.headers.get("ACCESS-KEY")
+            if key is None and route not in PUBLIC_ROUTES:
+                return self._reply(400, "40006", "Invalid ACCESS_KEY")
+            faults.delay()
+            if faults.rate_limited(key or self.client_address[0], url.path):
+                return self._reply(429, "429", "Too Many Requests")
+            if faults.failed(method):
+                return self._reply(400, faults.error_code, "Injected failure")
+            query = {name: values[0] for name, values in parse_qs(url.query).items()}
+            argument = body if method == "POST" else query
+            try:
+                return self._reply(*getattr(exchange, route)(key, argument))
+            except (KeyError, ValueError) as ve:
+                return self._reply(400, "40017", f"Parameter verification failed: {ve}")
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+    return Handler
+
+
+class Simulator:
+    """HTTP front end of ``SimulatedExchange`` plus the thread that moves its price."""
+
+    def __init__(self, exchange: SimulatedExchange, faults: Faults, host: str = "127.0.0.1", port: int = 0,
+                 tick_interval: float = 1.0):
+        self.exchange = exchange
+        self.tick_interval = tick_interval
+        self.server = ThreadingHTTPServer((host, port), make_handler(exchange, faults))
+        self.server.daemon_threads = True
+        self.stopped = threading.Event()
+        self.threads = []
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _ticker(self):
+        while not self.stopped.wait(self.tick_interval):
+            self.exchange.tick()
+
+    def start(self):
+        self.threads = [threading.Thread(target=self.server.serve_forever, daemon=True)]
+        if self.tick_interval > 0:
+            self.threads.append(threading.Thread(target=self._ticker, daemon=True))
+        for thread in self.threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+        self.server.shutdown()
+        self.server.server_close()
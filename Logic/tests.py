@@ -1,3 +1,312 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import time
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+import fakeredis
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+from django_redis import get_redis_connection
+
+from Logic import active_positions, monitor, signal_stream
+from Logic.client import reset_client
+from Logic.exceptions import TraderBusy
+from Logic.models import Trader, Position, SLTPOrder, Signal, SignalStatus, State, PlanType, PositionDirection
+from Logic.order_stream import FakeOrderStream, OrderStream
+from Logic.price_feed import publish_price
+from Logic.simulator import Faults, SimulatedExchange, Simulator
+from Logic.trader_lock import TraderLease
+from Logic.trigger_book import TriggerBook
+
+# django_redis over an in-process fake server, so Lua scripts, streams and the cache work without Redis.
+FAKE_REDIS_CACHES = {
+    'default': {
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': 'redis://fake-redis:6379/1',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeConnection},
+        }
+    }
+}
+
+
+@override_settings(CACHES=FAKE_REDIS_CACHES)
+class ActivePositionCounterTests(TransactionTestCase):
+
+    def setUp(self):
+        get_redis_connection("default").flushdb()
+        self.trader = Trader.objects.create(name="test", api_key="key", secret_key="secret", api_passphrase="pass")
+
+    def open_position(self):
+        return Position.objects.create(trader=self.trader, coin="BTCUSDT_UMCBL", quantity=Decimal("0.002"),
+                                       state=State.Active.value, direction=PositionDirection.long.value)
+
+    def test_counts_follow_committed_saves(self):
+        self.assertEqual(active_positions.active_count(self.trader.id), 0)
+        position = self.open_position()
+        self.assertEqual(active_positions.active_count(self.trader.id), 1)
+        position.state = State.Inactive.value
+        position.save(update_fields=["state", "updated"])
+        self.assertEqual(active_positions.active_count(self.trader.id), 0)
+
+    def test_rolled_back_save_leaves_the_counts(self):
+        self.assertFalse(active_positions.any_active())
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.open_position()
+            raise RuntimeError
+        self.assertFalse(active_positions.any_active())
+
+
+@override_settings(CACHES=FAKE_REDIS_CACHES)
+class TraderLeaseTests(TransactionTestCase):
+
+    def setUp(self):
+        get_redis_connection("default").flushdb()
+        self.trader = Trader.objects.create(name="test", api_key="key", secret_key="secret", api_passphrase="pass")
+
+    def test_held_lease_is_renewed_past_its_length(self):
+        with TraderLease(self.trader, lease=0.3):
+            time.sleep(1)
+            with self.assertRaises(TraderBusy):
+                TraderLease(self.trader, wait=0).acquire()
+            self.trader.check_lease()
+        with TraderLease(self.trader, wait=0):
+            pass
+
+    @override_settings(TRADER_LOCK_MAX_HOLD=0.5)
+    def test_renewal_stops_after_the_longest_hold(self):
+        with TraderLease(self.trader, lease=0.3):
+            time.sleep(1.2)
+            with TraderLease(Trader.objects.get(id=self.trader.id), wait=0):
+                pass
+
+
+@override_settings(CACHES=FAKE_REDIS_CACHES, SIGNAL_COALESCE_MS=0)
+class SignalConsumerTests(TransactionTestCase):
+
+    def setUp(self):
+        get_redis_connection("default").flushdb()
+
+    def publish(self, key: str, received_at: float):
+        signal = Signal.objects.create(idempotency_key=key, direction=PositionDirection.long.value)
+        signal_stream.publish(signal, {"id": key, "received_at": received_at})
+        return signal
+
+    def test_signals_sent_before_the_group_existed_run_unless_stale(self):
+        fresh = self.publish("fresh", time.time())
+        stale = self.publish("stale", time.time() - 3600)
+        consumer = signal_stream.SignalConsumer(name="test", block_ms=None)
+        consumer.ensure_group()
+
+        with mock.patch("Logic.engine.execute_signal", return_value=[{"ok": True}]) as execute_signal:
+            consumer.poll()
+
+        execute_signal.assert_called_once_with(direction=PositionDirection.long.value)
+        fresh.refresh_from_db()
+        stale.refresh_from_db()
+        self.assertEqual(fresh.status, SignalStatus.executed.value)
+        self.assertEqual(stale.status, SignalStatus.expired.value)
+
+
+@override_settings(CACHES=FAKE_REDIS_CACHES, EXCHANGE_RATE_LIMIT_ENABLED=False, TRAILING_STOP_DISTANCE=0)
+class SimulatedExchangeTestCase(TransactionTestCase):
+    """Runs against ``Logic.simulator`` with one trader holding a long position and its SL/TP bracket."""
+
+    def setUp(self):
+        get_redis_connection("default").flushdb()
+        # The monitor's trigger book outlives a test; a fresh one can't mistake the reset version for its own.
+        book = mock.patch.object(monitor, "_trigger_book", TriggerBook())
+        book.start()
+        self.addCleanup(book.stop)
+        self.exchange = SimulatedExchange(seed=1)
+        self.simulator = Simulator(self.exchange, Faults(), tick_interval=0).start()
+        settings_override = override_settings(COINCATCH_BASE_URL=self.simulator.url)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        reset_client()
+        self.addCleanup(reset_client)
+        self.addCleanup(self.simulator.stop)
+
+        self.trader = Trader.objects.create(name="test", api_key="key", secret_key="secret", api_passphrase="pass")
+        self.trader.get_long_sign()
+        self.position = Position.objects.get(trader=self.trader, state=State.Active.value)
+
+    def tps(self):
+        return list(SLTPOrder.objects.filter(position=self.position, plan_type=PlanType.tp.value)
+                    .order_by("trigger_price"))
+
+    def remote_status(self, order):
+        return self.exchange.plans[order.remote_id]["status"]
+
+
+class MonitorTickTests(SimulatedExchangeTestCase):
+
+    def test_tick_applies_a_triggered_take_profit(self):
+        self.assertEqual(self.position.direction, PositionDirection.long.value)
+        first_tp = self.tps()[0]
+        quantity = self.position.quantity
+
+        self.exchange.set_price(float(first_tp.trigger_price) + 1)
+        self.assertEqual(self.remote_status(first_tp), "triggered")
+        monitor.run_tick()
+
+        self.position.refresh_from_db()
+        first_tp.refresh_from_db()
+        self.assertEqual(first_tp.state, State.Inactive.value)
+        self.assertEqual(self.position.state, State.Active.value)
+        self.assertEqual(self.position.quantity, quantity - first_tp.quantity)
+
+    def test_position_a_failed_tick_probed_is_probed_again(self):
+        first_tp = self.tps()[0]
+        quantity = self.position.quantity
+        quiet, now = self.position.entry_price, time.time()
+        monitor.run_tick()  # the first tick sweeps everything; the next ones follow the price
+
+        # The price touched TP1 since the last tick, but the exchange didn't answer the probe.
+        cache.set(monitor.MONITOR_LAST_TICK_KEY, now - 20, timeout=None)
+        for offset in range(-20, 1, 2):
+            publish_price(self.position.coin, first_tp.trigger_price + 1 if offset == -18 else quiet, now + offset)
+        self.exchange.set_price(float(first_tp.trigger_price) + 1)
+        with mock.patch.object(Trader, "get_current_plans", side_effect=Exception("timeout")):
+            monitor.run_tick()
+        self.position.refresh_from_db()
+        self.assertEqual(self.position.quantity, quantity)
+
+        # The price stayed away from every trigger since then; the position is probed anyway.
+        publish_price(self.position.coin, quiet)
+        monitor.run_tick()
+        self.position.refresh_from_db()
+        self.assertEqual(self.position.quantity, quantity - first_tp.quantity)
+
+    def test_tick_closes_the_position_on_its_stop_loss(self):
+        sl = SLTPOrder.objects.get(position=self.position, plan_type=PlanType.sl.value)
+
+        self.exchange.set_price(float(sl.trigger_price) - 1)
+        monitor.run_tick()
+
+        self.position.refresh_from_db()
+        self.assertEqual(self.position.state, State.Inactive.value)
+        self.assertFalse(SLTPOrder.objects.filter(position=self.position, state=State.Active.value).exists())
+        self.assertEqual(self.position.quantity, Decimal(0))
+
+
+class OrderStreamTests(SimulatedExchangeTestCase):
+
+    async def _push_and_wait(self, remote_id: str, status: str, quantity: Decimal):
+        fake = await FakeOrderStream().start()
+        consumer = asyncio.create_task(OrderStream(url=fake.url).consume(self.trader))
+        try:
+            while not fake.clients:
+                await asyncio.sleep(0.01)
+            await fake.push_plan(remote_id, status)
+            for _ in range(200):
+                await sync_to_async(self.position.refresh_from_db)()
+                if self.position.quantity != quantity:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            consumer.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await consumer
+            await fake.stop()
+
+    def test_pushed_trigger_reduces_the_position(self):
+        first_tp = self.tps()[0]
+        quantity = self.position.quantity
+        self.exchange.set_price(float(first_tp.trigger_price) + 1)
+
+        asyncio.run(asyncio.wait_for(self._push_and_wait(first_tp.remote_id, "triggered", quantity), timeout=10))
+
+        first_tp.refresh_from_db()
+        self.assertEqual(first_tp.state, State.Inactive.value)
+        self.assertEqual(self.position.state, State.Active.value)
+        self.assertEqual(self.position.quantity, quantity - first_tp.quantity)
+
+    def test_pushed_last_take_profit_closes_the_position(self):
+        last_tp = self.tps()[-1]
+        quantity = self.position.quantity
+        self.exchange.set_price(float(last_tp.trigger_price) + 1)
+
+        asyncio.run(asyncio.wait_for(self._push_and_wait(last_tp.remote_id, "triggered", quantity), timeout=10))
+
+        self.assertEqual(self.position.state, State.Inactive.value)
+        self.assertFalse(SLTPOrder.objects.filter(position=self.position, state=State.Active.value).exists())
+
+
+class ChangeTriggerPriceTests(SimulatedExchangeTestCase):
+
+    def test_fired_plan_keeps_its_recorded_trigger(self):
+        sl = SLTPOrder.objects.get(position=self.position, plan_type=PlanType.sl.value)
+        trigger_price = sl.trigger_price
+        self.exchange.set_price(float(trigger_price) - 1)
+
+        self.assertEqual(sl.change_trigger_price(new_trigger_price=trigger_price + 10), "Changed")
+
+        sl.refresh_from_db()
+        self.assertEqual(sl.trigger_price, trigger_price)
+
+
+@override_settings(REVERSE_POSITION_MODE=True, REVERSE_FILLS_RETRY_DELAY=0)
+class ReversePositionTests(SimulatedExchangeTestCase):
+
+    def active_positions(self):
+        return list(Position.objects.filter(trader=self.trader, state=State.Active.value))
+
+    def test_reverse_replaces_the_position(self):
+        self.trader.get_short_sign()
+
+        self.position.refresh_from_db()
+        self.assertEqual(self.position.state, State.Inactive.value)
+        [reversed_position] = self.active_positions()
+        self.assertEqual(reversed_position.direction, PositionDirection.short.value)
+        self.assertEqual(SLTPOrder.objects.filter(position=reversed_position, state=State.Active.value).count(), 3)
+
+    def test_reverse_without_fills_still_leaves_one_active_position(self):
+        with mock.patch.object(Trader, "get_order_fills", return_value=[]), self.assertRaises(Exception):
+            self.trader.get_short_sign()
+
+        self.position.refresh_from_db()
+        self.assertEqual(self.position.state, State.Inactive.value)
+        self.assertFalse(SLTPOrder.objects.filter(position=self.position, state=State.Active.value).exists())
+        [reversed_position] = self.active_positions()
+        self.assertEqual(reversed_position.direction, PositionDirection.short.value)
+        self.assertIsNotNone(reversed_position.entry_price)
+
+        # The next signal is not blocked by a leftover position.
+        self.trader.get_long_sign()
+        self.assertEqual(len(self.active_positions()), 1)
+
+
+class RejectedBracketTests(SimulatedExchangeTestCase):
+
+    def test_take_profit_that_could_not_be_cancelled_is_kept(self):
+        place_sltp, rejected = Trader.place_sltp, []
+
+        def reject_one_take_profit(trader, **kwargs):
+            if kwargs["plan_type"] == PlanType.tp.value and not rejected:
+                rejected.append(kwargs["trigger_price"])
+                raise Exception("rejected")
+            return place_sltp(trader, **kwargs)
+
+        with mock.patch.object(Trader, "place_sltp", autospec=True, side_effect=reject_one_take_profit), \
+                mock.patch.object(Trader, "cancel_sltp", return_value=False), self.assertRaises(Exception):
+            self.trader.get_short_sign()
+
+        position = Position.objects.get(trader=self.trader, state=State.Active.value)
+        self.assertEqual(position.direction, PositionDirection.short.value)
+        orders = SLTPOrder.objects.filter(position=position, state=State.Active.value)
+        self.assertEqual(sorted(order.plan_type for order in orders), sorted([PlanType.sl.value, PlanType.tp.value]))
+        for order in orders:
+            self.assertEqual(self.remote_status(order), "not_trigger")
+
+        # Firing that lone TP closes only its half of the position.
+        [tp] = [order for order in orders if order.plan_type == PlanType.tp.value]
+        self.exchange.set_price(float(tp.trigger_price) - 1)
+        monitor.run_tick()
+        position.refresh_from_db()
+        self.assertEqual(position.state, State.Active.value)
+        self.assertEqual(position.quantity, tp.quantity)
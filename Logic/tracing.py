@@ -0,0 +1,82 @@
+import contextvars
+import functools
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, CollectorRegistry, Histogram, generate_latest, multiprocess
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+# Only the stage goes into labels; trader and position ids would explode the series count, they go to the log.
+STAGE_SECONDS = Histogram("btcbot_stage_seconds", "Duration of one step of handling a signal",
+                          ["stage"], buckets=BUCKETS)
+SINCE_SIGNAL_SECONDS = Histogram("btcbot_since_signal_seconds", "Time from webhook receipt until a milestone",
+                                 ["milestone"], buckets=BUCKETS)
+
+_trace = contextvars.ContextVar("signal_trace", default=None)
+
+logger = logging.getLogger(__name__)
+
+
+def new_trace():
+    """A trace for one incoming signal; plain data so it can travel in Celery task kwargs."""
+    return {"id": uuid.uuid4().hex, "received_at": time.time()}
+
+
+def current_trace():
+    return _trace.get()
+
+
+@contextmanager
+def use_trace(trace: dict):
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def bind(function):
+    """Run ``function`` in a copy of the caller's context, e.g. on a pool thread; bind once per submit."""
+    return functools.partial(contextvars.copy_context().run, function)
+
+
+def _log(kind: str, name: str, seconds: float, tags: dict):
+    trace = _trace.get()
+    logger.info(kind, extra={kind: name, "ms": round(seconds * 1000, 1), "trace": trace["id"] if trace else None,
+                             **tags})
+
+
+@contextmanager
+def span(stage: str, **tags):
+    """Time the block as ``stage``; ``tags`` (trader, position, ...) only go to the log line."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(stage=stage).observe(elapsed)
+        _log("span", stage, elapsed, tags)
+
+
+def milestone(name: str, **tags):
+    """Record how long after the webhook the current signal reached ``name``; no-op outside a trace."""
+    trace = _trace.get()
+    if trace is None:
+        return
+    elapsed = time.time() - trace["received_at"]
+    SINCE_SIGNAL_SECONDS.labels(milestone=name).observe(elapsed)
+    _log("milestone", name, elapsed, tags)
+
+
+def metrics_payload():
+    # With PROMETHEUS_MULTIPROC_DIR set, every process (gunicorn, Celery children) writes its samples there
+    # and the endpoint merges them; otherwise only this process's registry is exported.
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
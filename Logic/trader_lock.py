@@ -0,0 +1,124 @@
+import logging
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from .exceptions import StaleLease, TraderBusy
+
+logger = logging.getLogger(__name__)
+
+# Take the lease and hand out the next fencing token in one step, so tokens follow acquisition order.
+ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+return false
+"""
+
+# Only the holder may release; a lease that expired and was taken over is left alone.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Only the holder may extend; a lease that was lost stays lost.
+RENEW_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+def _lock_key(trader_id: int):
+    return f"trader_lock:{trader_id}"
+
+
+def _fence_key(trader_id: int):
+    return f"trader_fence:{trader_id}"
+
+
+class TraderLease:
+    """Exclusive, expiring right to act for one trader across all workers.
+
+    Every acquisition gets a fencing token that is also written to
+    ``Trader.fence_token``. A holder whose lease ran out (a stuck worker) will
+    find a newer token there on ``check()`` and stop before it sends another order.
+
+    While held, a background thread renews the lease every third of its length, for
+    at most TRADER_LOCK_MAX_HOLD seconds; the lease itself only has to cover a holder
+    that died without releasing it.
+    """
+
+    def __init__(self, trader, lease: float = None, wait: float = None):
+        self.trader = trader
+        self.lease_ms = int((settings.TRADER_LOCK_LEASE if lease is None else lease) * 1000)
+        self.wait = settings.TRADER_LOCK_WAIT if wait is None else wait
+        self.owner = uuid.uuid4().hex
+        self.fence = None
+        self.redis = get_redis_connection("default")
+        self.released = threading.Event()
+
+    def _try_acquire(self):
+        fence = self.redis.eval(ACQUIRE_SCRIPT, 2, _lock_key(self.trader.id), _fence_key(self.trader.id),
+                                self.owner, self.lease_ms)
+        if not fence:
+            return False
+        from Logic.models import Trader
+        fence = int(fence)
+        if Trader.objects.filter(id=self.trader.id, fence_token__lt=fence).update(fence_token=fence):
+            self.fence = fence
+            return True
+        # Redis lost the counter (flush, failover): move it past the database's token and try again.
+        stored = Trader.objects.filter(id=self.trader.id).values_list("fence_token", flat=True).get()
+        self.redis.set(_fence_key(self.trader.id), stored)
+        self.redis.eval(RELEASE_SCRIPT, 1, _lock_key(self.trader.id), self.owner)
+        return False
+
+    def acquire(self):
+        deadline = time.monotonic() + self.wait
+        while True:
+            if self._try_acquire():
+                self.trader.lease = self
+                threading.Thread(target=self._renew, name=f"lease-{self.trader.id}", daemon=True).start()
+                return self
+            if time.monotonic() >= deadline:
+                raise TraderBusy(message=f"Trader {self.trader.id} is locked by another worker")
+            time.sleep(settings.TRADER_LOCK_POLL)
+
+    def _renew(self):
+        deadline = time.monotonic() + settings.TRADER_LOCK_MAX_HOLD
+        while not self.released.wait(self.lease_ms / 3000) and time.monotonic() < deadline:
+            try:
+                if not self.redis.eval(RENEW_SCRIPT, 1, _lock_key(self.trader.id), self.owner, self.lease_ms):
+                    # Taken over already; the holder's next check() raises StaleLease.
+                    return
+            except Exception:
+                logger.warning("Could not renew trader lease", exc_info=True,
+                               extra={"trader": self.trader.id, "fence": self.fence})
+
+    def check(self):
+        """Raise StaleLease if a newer holder has taken over this trader."""
+        from Logic.models import Trader
+        if not Trader.objects.filter(id=self.trader.id, fence_token=self.fence).exists():
+            raise StaleLease(message=f"Lease {self.fence} of trader {self.trader.id} was superseded")
+
+    def release(self):
+        self.released.set()
+        self.trader.lease = None
+        try:
+            self.redis.eval(RELEASE_SCRIPT, 1, _lock_key(self.trader.id), self.owner)
+        except Exception:
+            # The lease expires on its own; don't hide the caller's result or error.
+            logger.exception("Could not release trader lease", extra={"trader": self.trader.id, "fence": self.fence})
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,117 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from decimal import ROUND_DOWN, ROUND_UP, Decimal
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from . import tracing
+from .monitor import acquire_tick_lock, release_tick_lock
+from .price_feed import get_cached_price
+
+TRAILING_TICK_LOCK_KEY = "trailing_stop_tick"
+PRICE_TICK = Decimal("0.1")
+
+logger = logging.getLogger(__name__)
+
+
+def next_stop(rule, direction: str, price: Decimal, stop: Decimal):
+    """Best price after ``price`` and the SL the rule wants now, or None when the SL should stay at ``stop``."""
+    from Logic.models import PositionDirection
+    # best_price is stored with the trigger precision; compare at that precision or every tick looks like a new best.
+    price = price.quantize(PRICE_TICK)
+    if direction == PositionDirection.long.value:
+        best = price if rule.best_price is None else max(rule.best_price, price)
+        if rule.activation_price is not None and best < rule.activation_price:
+            return best, None
+        candidate = (best - rule.distance).quantize(PRICE_TICK, rounding=ROUND_DOWN)
+        # Never tighten by less than a step, and never put the stop on the wrong side of the price.
+        if candidate >= stop + rule.step and candidate < price:
+            return best, candidate
+    else:
+        best = price if rule.best_price is None else min(rule.best_price, price)
+        if rule.activation_price is not None and best > rule.activation_price:
+            return best, None
+        candidate = (best + rule.distance).quantize(PRICE_TICK, rounding=ROUND_UP)
+        if candidate <= stop - rule.step and candidate > price:
+            return best, candidate
+    return best, None
+
+
+def load_rules():
+    """Active rules with their position and the position's active SL (``active_sls``), in two queries."""
+    from Logic.models import TrailingRule, SLTPOrder, State, PlanType
+    active_sls = SLTPOrder.objects.filter(state=State.Active.value, plan_type=PlanType.sl.value) \
+        .select_related("trader")
+    return list(TrailingRule.objects.filter(state=State.Active.value).select_related("position")
+                .prefetch_related(Prefetch("position__sltporder_set", queryset=active_sls, to_attr="active_sls")))
+
+
+def _move(sl_order, trigger_price: Decimal):
+    with tracing.span("trailing_modify", trader=sl_order.trader_id, position=sl_order.position_id):
+        return sl_order.change_trigger_price(new_trigger_price=trigger_price)
+
+
+def run_tick():
+    """Evaluate every active trailing rule against the latest price; one tick runs at a time across all workers.
+
+    The evaluation is arithmetic over the loaded rules; only the SLs that moved by at
+    least a step are sent to the exchange, concurrently.
+    """
+    from Logic.models import TrailingRule, State
+    token = acquire_tick_lock(TRAILING_TICK_LOCK_KEY, timeout=settings.TRAILING_STOP_LOCK_TIMEOUT)
+    if token is None:
+        logger.info("Previous trailing stop tick is still running", extra={"sample": settings.LOG_MONITOR_SAMPLE})
+        return
+    try:
+        rules = load_rules()
+        prices, finished, improved, moves = {}, [], [], []
+        for rule in rules:
+            position = rule.position
+            if position.state != State.Active.value:
+                finished.append(rule.id)
+                continue
+            if len(position.active_sls) != 1:
+                # Between brackets (a second opening is replacing them); try again next tick.
+                continue
+            if position.coin not in prices:
+                prices[position.coin] = get_cached_price(coin=position.coin,
+                                                         max_staleness=settings.PRICE_FEED_MAX_STALENESS)
+            price = prices[position.coin]
+            if price is None:
+                continue
+            sl_order = position.active_sls[0]
+            best, trigger_price = next_stop(rule, direction=position.direction, price=price,
+                                            stop=sl_order.trigger_price)
+            if best != rule.best_price:
+                rule.best_price = best
+                rule.updated = timezone.now()
+                improved.append(rule)
+            if trigger_price is not None:
+                moves.append((sl_order, trigger_price))
+
+        if finished:
+            TrailingRule.objects.filter(id__in=finished).update(state=State.Inactive.value, updated=timezone.now())
+        if improved:
+            TrailingRule.objects.bulk_update(improved, ["best_price", "updated"])
+        if moves:
+            with ThreadPoolExecutor(max_workers=min(settings.TRAILING_STOP_WORKERS, len(moves))) as executor:
+                futures = [(sl_order, trigger_price, executor.submit(tracing.bind(_move), sl_order, trigger_price))
+                           for sl_order, trigger_price in moves]
+            for sl_order, trigger_price, future in futures:
+                if future.exception() is not None:
+                    logger.error("Could not move trailing stop", exc_info=future.exception(),
+                                 extra={"position": sl_order.position_id, "trigger_price": trigger_price})
+                elif future.result() is True:
+                    logger.info("Trailing stop moved", extra={"position": sl_order.position_id,
+                                                              "trigger_price": trigger_price})
+                elif future.result() == "Changed":
+                    # The SL fired before it could be moved; the monitor picks up the fill.
+                    logger.info("Trailing stop already triggered", extra={"position": sl_order.position_id,
+                                                                          "trigger_price": trigger_price})
+                else:
+                    logger.warning("Exchange refused trailing stop move",
+                                   extra={"position": sl_order.position_id, "trigger_price": trigger_price})
+    finally:
+        release_tick_lock(TRAILING_TICK_LOCK_KEY, token)
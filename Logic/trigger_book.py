@@ -0,0 +1,77 @@
+import bisect
+import logging
+
+from django_redis import get_redis_connection
+
+logger = logging.getLogger(__name__)
+
+TRIGGER_BOOK_VERSION_KEY = "trigger_book_version"
+
+_UNBUILT = object()
+
+
+def touch():
+    """Tell every process's book that active SL/TP orders changed; call it after any such write."""
+    try:
+        get_redis_connection("default").incr(TRIGGER_BOOK_VERSION_KEY)
+    except Exception:
+        # A book that misses a bump is only caught up by the monitor's periodic full sweep.
+        logger.exception("Could not bump the trigger book version")
+
+
+class _Side:
+    """Trigger prices of one coin and side, kept sorted with the position each order protects."""
+
+    def __init__(self, entries):
+        entries = sorted(entries)
+        self.prices = [price for price, position_id in entries]
+        self.position_ids = [position_id for price, position_id in entries]
+
+
+class TriggerBook:
+    """Shadow copy of every active SL/TP trigger price, per coin, split by trigger direction.
+
+    ``below`` holds the orders that fire when the price falls to their trigger (long
+    SLs, short TPs), ``above`` the ones that fire when it rises to it (long TPs,
+    short SLs). Finding the orders a price range reached is a bisect plus the slice
+    of hits. The book is rebuilt from the database only when the shared version key
+    moved, i.e. after orders were placed, moved or inactivated.
+    """
+
+    def __init__(self):
+        self.version = _UNBUILT
+        self.below = {}
+        self.above = {}
+
+    def refresh(self):
+        version = get_redis_connection("default").get(TRIGGER_BOOK_VERSION_KEY)
+        if version != self.version:
+            # Read the version first: a change during the rebuild bumps it again and forces another one.
+            self.rebuild()
+            self.version = version
+
+    def rebuild(self):
+        from Logic.models import SLTPOrder, State, PlanType, PositionDirection
+        below, above = {}, {}
+        rows = SLTPOrder.objects.filter(state=State.Active.value) \
+            .values_list("coin", "plan_type", "trigger_price", "position_id", "position__direction")
+        for coin, plan_type, trigger_price, position_id, direction in rows:
+            falling = (plan_type == PlanType.sl.value) == (direction == PositionDirection.long.value)
+            (below if falling else above).setdefault(coin, []).append((float(trigger_price), position_id))
+        self.below = {coin: _Side(entries) for coin, entries in below.items()}
+        self.above = {coin: _Side(entries) for coin, entries in above.items()}
+
+    def coins(self):
+        return set(self.below) | set(self.above)
+
+    def reached(self, coin: str, low: float, high: float, band: float = 0.0):
+        """Positions with an order on ``coin`` that a price moving within [low, high] reached, or came within
+        ``band`` (a fraction of the price) of."""
+        position_ids = set()
+        side = self.below.get(coin)
+        if side is not None:
+            position_ids.update(side.position_ids[bisect.bisect_left(side.prices, low * (1 - band)):])
+        side = self.above.get(coin)
+        if side is not None:
+            position_ids.update(side.position_ids[:bisect.bisect_right(side.prices, high * (1 + band))])
+        return position_ids
@@ -1,8 +1,12 @@
 from django.urls import path
-from .views import LongView, ShortView, GetPositionState
+from django.views.decorators.csrf import csrf_exempt
+from .views import LongView, ShortView, GetPositionState, RateLimitMetrics, TraderPnl, Metrics
 
 urlpatterns = [
-    path('long/', LongView.as_view()),
-    path('short/', ShortView.as_view()),
-    path('ask_active_position/', GetPositionState.as_view())
+    path('long/', csrf_exempt(LongView.as_view())),
+    path('short/', csrf_exempt(ShortView.as_view())),
+    path('ask_active_position/', GetPositionState.as_view()),
+    path('rate_limits/', RateLimitMetrics.as_view()),
+    path('pnl/', TraderPnl.as_view()),
+    path('metrics/', Metrics.as_view()),
 ]
@@ -1,45 +1,122 @@
+import json
+import logging
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db.models import Sum
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from . import active_positions, signal_stream, tracing
 from .models import *
-from .tasks import get_long_sign_task, get_short_sign_task
-import traceback
+from .ratelimit import metrics as rate_limit_metrics
+
+logger = logging.getLogger(__name__)
+
+
+def _idempotency_key(request):
+    key = request.headers.get("Idempotency-Key")
+    if key is None and request.body:
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and payload.get("idempotency_key") is not None:
+            key = str(payload["idempotency_key"])
+    return key
+
 
+def _int_param(request, name: str, default: int = None, minimum: int = None):
+    value = request.query_params.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+    if minimum is not None and value < minimum:
+        raise ValidationError({name: f"Must be at least {minimum}."})
+    return value
 
-class LongView(APIView):
 
-    def post(self, request):
-        traders = Trader.objects.all()
-        for trader in traders:
-            try:
-                get_long_sign_task.apply_async(kwargs={"trader_id": trader.id}, soft_time_limit=30, time_limit=34)
-            except Exception as e:
-                print(e.__str__() + "\n" + str(traceback.format_exc()))
-                print(f'trader.name: {trader.name}')
+class SignalView(View):
+    """Accept a signal, persist it once per idempotency key and hand it to the consumers.
 
-        return Response(data={"msg": "Okay"}, status=status.HTTP_200_OK)
+    The response only waits for one insert and one XADD, whatever the number of
+    traders; ``manage.py consume_signals`` does the execution.
+    """
+    direction = None
 
+    async def post(self, request):
+        trace = tracing.new_trace()
+        with tracing.use_trace(trace), tracing.span("webhook", direction=self.direction):
+            key = _idempotency_key(request) or trace["id"]
+            with tracing.span("persist"):
+                signal, created = await Signal.objects.aget_or_create(
+                    idempotency_key=key[:100], defaults={"direction": self.direction, "trace_id": trace["id"]})
+            if not created:
+                logger.info("Duplicate signal", extra={"signal": signal.id, "idempotency_key": key})
+                return JsonResponse(data={"msg": "Duplicate", "signal": signal.id, "trace": signal.trace_id},
+                                    status=status.HTTP_200_OK)
+            logger.info("Signal received", extra={"direction": self.direction, "signal": signal.id,
+                                                   "trace": trace["id"], "remote_addr": request.META.get("REMOTE_ADDR")})
+            with tracing.span("enqueue"):
+                await sync_to_async(signal_stream.publish, thread_sensitive=False)(signal, trace)
+        return JsonResponse(data={"msg": "Okay", "signal": signal.id, "trace": trace["id"]},
+                            status=status.HTTP_200_OK)
 
-class ShortView(APIView):
 
-    def post(self, request):
-        traders = Trader.objects.all()
-        for trader in traders:
-            try:
-                get_short_sign_task.apply_async(kwargs={"trader_id": trader.id}, soft_time_limit=20, time_limit=22)
-            except Exception as e:
-                print(e.__str__() + "\n" + str(traceback.format_exc()))
+class LongView(SignalView):
+    direction = PositionDirection.long.value
 
-        return Response(data={"msg": "Okay"}, status=status.HTTP_200_OK)
+
+class ShortView(SignalView):
+    direction = PositionDirection.short.value
 
 
 class GetPositionState(APIView):
 
     def get(self, request):
-        have_any_active_positions = False
-        for trader in Trader.objects.all():
-            if trader.position_set.filter(state=State.Active.value).exists():
-                have_any_active_positions = True
-                break
+        trader_id = _int_param(request, "trader")
+        if trader_id is not None:
+            count = active_positions.active_count(trader_id=trader_id)
+            return Response(data={"trader": trader_id, "active_position": count > 0, "active_positions": count},
+                            status=status.HTTP_200_OK)
+        if request.query_params.get("breakdown") is not None:
+            counts = active_positions.active_counts()
+            return Response(data={"active_position": bool(counts), "traders": counts}, status=status.HTTP_200_OK)
+        return Response(data={"active_position": active_positions.any_active()}, status=status.HTTP_200_OK)
+
 
-        return Response(data={"active_position": have_any_active_positions}, status=status.HTTP_200_OK)
+class RateLimitMetrics(APIView):
+
+    def get(self, request):
+        return Response(data=rate_limit_metrics(), status=status.HTTP_200_OK)
+
+
+class TraderPnl(APIView):
+
+    def get(self, request):
+        fields = ("profit", "fee", "volume", "number_of_fills")
+        trader_id = _int_param(request, "trader")
+        if trader_id is None:
+            totals = (TraderCoinPnl.objects.values("trader_id")
+                      .annotate(**{field: Sum(field) for field in fields}).order_by("trader_id"))
+            return Response(data={"traders": list(totals)}, status=status.HTTP_200_OK)
+        days = _int_param(request, "days", default=30, minimum=1)
+        since = timezone.now().date() - timedelta(days=days)
+        by_coin = list(TraderCoinPnl.objects.filter(trader_id=trader_id).values("coin", *fields))
+        by_day = list(TraderDailyPnl.objects.filter(trader_id=trader_id, day__gt=since)
+                      .order_by("day").values("day", *fields))
+        return Response(data={"trader": trader_id, "coins": by_coin, "days": by_day}, status=status.HTTP_200_OK)
+
+
+class Metrics(APIView):
+
+    def get(self, request):
+        return HttpResponse(tracing.metrics_payload(), content_type=CONTENT_TYPE_LATEST)